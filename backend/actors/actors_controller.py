@@ -1,88 +1,206 @@
 from flask import Flask, abort, make_response, request, jsonify
-from models import Gender, Actor
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from models import Cast, Gender, Actor, _replace_casts
 from utilities.utilities import (
+    InternalColumnPatch,
     _abort_if_falsy_and_not_none,
-    _camel_case_dict,
     _convert_json_patch_request_to_dict,
     _create_etag,
+    _sparse_fieldset,
 )
+from utilities.serializers import _serializer
+from utilities.pagination import (
+    _count_mode,
+    _keyset_page,
+    _offset_page,
+    _page_size,
+    _total,
+)
+from utilities.conditional import (
+    _apply_delete,
+    _apply_patch,
+    _cacheable,
+    _collection_etag,
+    _collection_not_modified,
+    _not_modified,
+)
+from utilities.batch import _batch_create, _id_set
+from utilities.cache import _cached_response
+from utilities.export import _ndjson_export
+from utilities.fragments import _encoded_records, _fragments_enabled
+from utilities.sql_json import _json_array, _json_body, _json_record, _render_mode
+from utilities.search import _apply_search_filter, _order_by_search_rank, _suggest
 from auth.validator import requires_auth
 
 ACTORS_PER_PAGE = 10
 
 
+def _actor_values(body):
+    # Column values for a new actor from a request body; raises ValueError
+    if not isinstance(body, dict):
+        raise ValueError("expected an object")
+    name = body.get("name")
+    if not isinstance(name, str):
+        raise ValueError("name must be a string")
+    gender = body.get("gender")
+    if gender is not None and gender not in (gender.value for gender in Gender):
+        raise ValueError("invalid gender")
+    age = body.get("age")
+    if not isinstance(age, int) or age <= 0:
+        raise ValueError("age must be a positive integer")
+    photo_url = body.get("photoUrl")
+    if photo_url is not None and not isinstance(photo_url, str):
+        raise ValueError("photoUrl must be a string")
+
+    return {
+        "name": name.strip(),
+        "gender": Gender[gender] if gender else None,
+        "age": age,
+        "photo_url": photo_url.strip() if photo_url else photo_url,
+    }
+
+
 def actors_controller(app: Flask):
     @app.route("/actors", methods=["GET"])
     @requires_auth("read:actors")
+    @_cached_response(Actor)
     def get_actors():
-        page = request.args.get("page", 1, type=int)
+        page = max(request.args.get("page", 1, type=int), 1)
+        cursor = request.args.get("cursor", None, type=str)
         filter_by = request.args.get("search", "", type=str)
-        search_term = f"%{filter_by}%"
-        start = (page - 1) * ACTORS_PER_PAGE
-        end = start + ACTORS_PER_PAGE
-        count = Actor.query.filter(Actor.name.ilike(search_term)).count()
-        actors = (
-            Actor.query.filter(Actor.name.ilike(search_term))
-            .order_by(Actor.name)
-            .slice(start, end)
-            .all()
+        per_page = _page_size(ACTORS_PER_PAGE)
+        try:
+            count_mode = _count_mode()
+            render_mode = _render_mode()
+            columns, include_movies = _sparse_fieldset(Actor, "movies")
+        except ValueError:
+            abort(400)
+        etag = _collection_etag(Actor)
+        not_modified = _collection_not_modified(etag)
+        if not_modified is not None:
+            return not_modified
+        relation = "movies" if include_movies else None
+        fragments = render_mode == "orm" and _fragments_enabled(columns)
+        query = Actor.query
+        if render_mode == "db":
+            query = query.with_entities(
+                _json_record(Actor, columns, relation), Actor.name, Actor.id
+            )
+        elif columns is not None:
+            loaded = [getattr(Actor, column) for column in {*columns, "name"}]
+            query = query.options(load_only(*loaded))
+        if render_mode == "orm" and include_movies and not fragments:
+            query = query.options(selectinload(Actor.movies))
+        query = _apply_search_filter(query, Actor.name, filter_by)
+
+        if cursor is not None:
+            try:
+                actors, next_cursor = _keyset_page(
+                    query, [Actor.name, Actor.id], cursor, per_page
+                )
+            except ValueError:
+                abort(400)
+            total = _total(query, count_mode)
+            has_more = next_cursor is not None
+            payload = {"success": True, "nextCursor": next_cursor}
+        else:
+            start = (page - 1) * per_page
+            actors, total, has_more = _offset_page(
+                _order_by_search_rank(query, Actor.name, filter_by, Actor.id),
+                start,
+                per_page,
+                count_mode,
+            )
+            payload = {"success": True, "offset": start}
+
+        if total is None:
+            payload["hasMore"] = has_more
+        else:
+            payload["totalActors"] = total
+        if render_mode == "db":
+            body = _json_body(payload, {"actors": _json_array(actors)})
+            response = app.response_class(body, mimetype="application/json")
+            return _cacheable(response, etag), 200
+        if fragments:
+            encoded = _json_array(_encoded_records(Actor, actors, relation))
+            body = _json_body(payload, {"actors": encoded})
+            response = app.response_class(body, mimetype="application/json")
+            return _cacheable(response, etag), 200
+        serialize = _serializer(Actor, columns, relation)
+        payload["actors"] = [serialize(actor) for actor in actors]
+        return (
+            _cacheable(jsonify(payload), etag),
+            200,
         )
-        payload = _camel_case_dict(
-            {
-                "success": True,
-                "actors": [actor.format() for actor in actors],
-                "total_actors": count,
-                "offset": start,
-            }
+
+    @app.route("/actors/export", methods=["GET"])
+    @requires_auth("read:actors")
+    def export_actors():
+        try:
+            return _ndjson_export(Actor, Actor.updated_at, [Actor.id])
+        except ValueError:
+            abort(400)
+
+    @app.route("/actors/suggest", methods=["GET"])
+    @requires_auth("read:actors")
+    @_cached_response(Actor)
+    def suggest_actors():
+        filter_by = request.args.get("search", "", type=str).strip()
+        if not filter_by:
+            return jsonify({"success": True, "suggestions": []}), 200
+        rows = _suggest(
+            Actor.name, Cast.actor_id, filter_by, _page_size(ACTORS_PER_PAGE)
         )
         return (
-            jsonify(payload),
+            jsonify(
+                {
+                    "success": True,
+                    "suggestions": [{"id": row[0], "label": row[1]} for row in rows],
+                }
+            ),
             200,
         )
 
     @app.route("/actors", methods=["POST"])
     @requires_auth("create:actors")
     def post_actor():
-        body = request.get_json()
-        if not (
-            isinstance(body.get("name"), str)
-            and (
-                body.get("gender") is None
-                or body.get("gender") in (gender.value for gender in Gender)
-            )
-            and isinstance(body.get("age"), int)
-            and body.get("age") > 0
-            and (body.get("photoUrl") is None or isinstance(body.get("photoUrl"), str))
-        ):
+        try:
+            values = _actor_values(request.get_json())
+        except ValueError:
             abort(400)
 
-        gender = body.get("gender", None)
-        name: str = body.get("name")
-        photo_url: str | None = body.get("photoUrl", None)
-        if photo_url:
-            photo_url = photo_url.strip()
-
-        actor = Actor(
-            name=name.strip(),
-            gender=(Gender[gender] if gender else None),
-            age=body.get("age"),
-            photo_url=photo_url,
-        )
+        actor = Actor(**values)
 
         actor.add()
         return jsonify({"success": True, "id": actor.id}), 201
 
+    @app.route("/actors:batch", methods=["POST"])
+    @requires_auth("create:actors")
+    def post_actors_batch():
+        return _batch_create(Actor, _actor_values)
+
     @app.route("/actors/<int:actor_id>", methods=["GET"])
     @requires_auth("read:actors")
+    @_cached_response(Actor)
     def get_actor(actor_id: int):
         if not isinstance(actor_id, int):
             abort(400)
-        actor = Actor.query.get_or_404(actor_id)
+        not_modified = _not_modified(Actor, actor_id)
+        if not_modified is not None:
+            return not_modified
+        if _fragments_enabled(None):
+            actor = Actor.query.get_or_404(actor_id)
+            encoded = _encoded_records(Actor, [actor], "movies")[0]
+            body = _json_body({"success": True}, {"actor": encoded})
+            response = app.response_class(body, mimetype="application/json")
+            response.set_etag(_create_etag(actor))
+            return response
+        actor = Actor.query.options(joinedload(Actor.movies)).get_or_404(actor_id)
         etag = _create_etag(actor)
 
-        payload = _camel_case_dict({"success": True, "actor": actor.format()})
+        payload = {"success": True, "actor": _serializer(Actor, None, "movies")(actor)}
         response = make_response(jsonify(payload), 200)
-        response.headers["ETag"] = etag
+        response.set_etag(etag)
         return response
 
     # JSON Patch https://datatracker.ietf.org/doc/html/rfc6902
@@ -106,60 +224,59 @@ def actors_controller(app: Flask):
 
         try:
             data = _convert_json_patch_request_to_dict(body, Actor)
+        except InternalColumnPatch:
+            abort(422)
         except TypeError:
             abort(400)
         except ValueError:
             abort(400)
 
-        actor = Actor.query.get_or_404(actor_id)
-
-        orig_hash = _create_etag(actor)
-
+        values = {}
         for key in data:
             if key == "name":
                 if not data["name"] or not isinstance(data["name"], str):
                     abort(400)
                 else:
-                    actor.name = data["name"].strip()
+                    values["name"] = data["name"].strip()
             if key == "gender":
                 try:
-                    actor.gender = Gender[data["gender"]] if data["gender"] else None
+                    values["gender"] = (
+                        Gender[data["gender"]] if data["gender"] else None
+                    )
                 except Exception:
                     abort(400)
             if key == "age":
                 if not data["age"] or not isinstance(data["age"], int):
                     abort(400)
-                actor.age = data["age"]
+                values["age"] = data["age"]
             if key == "photo_url":
                 if _abort_if_falsy_and_not_none(data["photo_url"]):
                     abort(400)
                 if data["photo_url"] and not isinstance(data["photo_url"], str):
                     return abort(400)
-                actor.photo_url = (
+                values["photo_url"] = (
                     data["photo_url"].strip() if data["photo_url"] else None
                 )
 
-        new_hash = _create_etag(actor)
+        return _apply_patch(Actor, actor_id, values)
 
-        if new_hash == orig_hash:
-            response = make_response(jsonify(), 204)
-            response.headers["ETag"] = orig_hash
-            return response
-        else:
-            actor.update()  # Only update if content changed
-            response = make_response(jsonify({"success": True, "id": actor.id}), 200)
-            response.headers["ETag"] = new_hash
-            return response
+    @app.route("/actors/<int:actor_id>/movies", methods=["PUT"])
+    @requires_auth("create:casts", "delete:casts")
+    def put_actor_movies(actor_id: int):
+        try:
+            movie_ids = _id_set(request.get_json(), "movieIds")
+        except ValueError:
+            abort(400)
+        changes = _replace_casts(Actor, actor_id, movie_ids)
+        if changes is None:
+            abort(404)
+        added, removed = changes
+        payload = {"success": True, "id": actor_id, "added": added, "removed": removed}
+        return jsonify(payload), 200
 
     @app.route("/actors/<int:actor_id>", methods=["DELETE"])
     @requires_auth("delete:actors")
     def delete_actor(actor_id: int):
         if not isinstance(actor_id, int):
             abort(400)
-        actor = Actor.query.get_or_404(actor_id)
-        actor_id = actor.id
-        actor.delete()
-
-        payload = _camel_case_dict({"success": True, "id": actor_id})
-        response = make_response(jsonify(payload), 200)
-        return response
+        return _apply_delete(Actor, actor_id)
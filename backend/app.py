@@ -1,11 +1,14 @@
 import os
 from flask import Flask, jsonify
 from actors.actors_controller import actors_controller
+from auth.validator import requires_auth
 from casts.casts_controller import casts_controller
 from models import setup_db
 from flask_cors import CORS
 from movies.movies_controller import movies_controller
+from utilities.cache import ResponseCache, _cache_backend
 from utilities.hydrate_db import hydrate_db
+from utilities.json_provider import _json_provider
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -17,6 +20,7 @@ seed_db = os.environ.get("HYDRATE_DB", False)
 def create_app(test_config=None):
 
     app = Flask(__name__)
+    app.json = _json_provider(app)
     if test_config is None:
         setup_db(app)
         if seed_db:
@@ -25,6 +29,7 @@ def create_app(test_config=None):
         database_path = test_config.get("SQLALCHEMY_DATABASE_URI")
         setup_db(app, database_path=database_path)
     CORS(app, origins=origins.split(","))
+    app.extensions["response_cache"] = ResponseCache(_cache_backend())
 
     @app.after_request
     def after_request(response):
@@ -40,6 +45,12 @@ def create_app(test_config=None):
     def healthcheck():
         return jsonify({"success": True}), 200
 
+    @app.route("/cache/stats", methods=["GET"])
+    @requires_auth("read:actors")
+    def cache_stats():
+        stats = app.extensions["response_cache"].stats()
+        return jsonify({"success": True, **stats}), 200
+
     movies_controller(app)
 
     actors_controller(app)
@@ -66,6 +77,14 @@ def create_app(test_config=None):
     def not_allowed(error):
         return jsonify({"success": False, "error": "Method Not Allowed"}), 405
 
+    @app.errorhandler(409)
+    def conflict(error):
+        return jsonify({"success": False, "error": "Conflict"}), 409
+
+    @app.errorhandler(412)
+    def precondition_failed(error):
+        return jsonify({"success": False, "error": "Precondition Failed"}), 412
+
     @app.errorhandler(415)
     def unsupported_media_type(error):
         return jsonify({"success": False, "error": "Unsupported Media Type"}), 415
@@ -0,0 +1,152 @@
+import base64
+import json
+import time
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from jose import jwk, jwt
+
+
+class TokenExpired(Exception):
+    pass
+
+
+class InvalidClaims(Exception):
+    pass
+
+
+class InvalidToken(Exception):
+    pass
+
+
+class JoseBackend:
+    """Verification through python-jose."""
+
+    def get_unverified_header(self, token: str):
+        try:
+            return jwt.get_unverified_header(token)
+        except Exception as e:
+            raise InvalidToken(str(e)) from e
+
+    def load_key(self, key: dict, algorithm: str):
+        return jwk.construct(key, key.get("alg", algorithm))
+
+    def decode(self, token: str, key, algorithms: list[str], audience, issuer):
+        try:
+            return jwt.decode(
+                token, key, algorithms=algorithms, audience=audience, issuer=issuer
+            )
+        except jwt.ExpiredSignatureError as e:  # type: ignore
+            raise TokenExpired(str(e)) from e
+        except jwt.JWTClaimsError as e:  # type: ignore
+            raise InvalidClaims(str(e)) from e
+        except Exception as e:
+            raise InvalidToken(str(e)) from e
+
+
+_RSA_HASHES = {"RS256": hashes.SHA256, "RS384": hashes.SHA384, "RS512": hashes.SHA512}
+
+
+def _b64decode(segment: str):
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _int(claims: dict, name: str):
+    # Like python-jose: a claim that int() rejects is an invalid claim
+    try:
+        return int(claims[name])
+    except ValueError:
+        raise InvalidClaims(f"{name} must be an integer")
+
+
+def _validate_claims(claims: dict, audience, issuer):
+    # The same checks, in the same order, as python-jose's jwt.decode
+    now = int(time.time())
+    if "iat" in claims:
+        _int(claims, "iat")
+    if "nbf" in claims and _int(claims, "nbf") > now:
+        raise InvalidClaims("The token is not yet valid (nbf)")
+    if "exp" in claims and _int(claims, "exp") < now:
+        raise TokenExpired("Signature has expired.")
+    if "aud" in claims:
+        audiences = claims["aud"]
+        if isinstance(audiences, str):
+            audiences = [audiences]
+        if not isinstance(audiences, list) or not all(
+            isinstance(value, str) for value in audiences
+        ):
+            raise InvalidClaims("Invalid claim format in token")
+        if audience not in audiences:
+            raise InvalidClaims("Invalid audience")
+    if issuer is not None and claims.get("iss") != issuer:
+        raise InvalidClaims("Invalid issuer")
+    if "sub" in claims and not isinstance(claims["sub"], str):
+        raise InvalidClaims("Subject must be a string.")
+    if "jti" in claims and not isinstance(claims["jti"], str):
+        raise InvalidClaims("JWT ID must be a string.")
+    if "at_hash" in claims:
+        raise InvalidClaims(
+            "No access_token provided to compare against at_hash claim."
+        )
+
+
+class CryptographyBackend:
+    """
+    RS256/384/512 verification straight through cryptography, with keys held
+    as RSAPublicKey objects: none of python-jose's per-call key wrapping and
+    algorithm dispatch.
+    """
+
+    def _segments(self, token: str):
+        try:
+            header_segment, payload_segment, signature_segment = token.split(".")
+            header = json.loads(_b64decode(header_segment))
+        except Exception as e:
+            raise InvalidToken("Error decoding token headers.") from e
+        if not isinstance(header, dict):
+            raise InvalidToken("Invalid header string: must be a json object")
+        return header, header_segment, payload_segment, signature_segment
+
+    def get_unverified_header(self, token: str):
+        return self._segments(token)[0]
+
+    def load_key(self, key: dict, algorithm: str):
+        if key.get("kty") != "RSA":
+            raise ValueError(f"unsupported key type {key.get('kty')}")
+        n = int.from_bytes(_b64decode(key["n"]), "big")
+        e = int.from_bytes(_b64decode(key["e"]), "big")
+        return rsa.RSAPublicNumbers(e, n).public_key()
+
+    def decode(self, token: str, key, algorithms: list[str], audience, issuer):
+        header, header_segment, payload_segment, signature_segment = self._segments(
+            token
+        )
+        algorithm = header.get("alg")
+        if algorithm not in algorithms or algorithm not in _RSA_HASHES:
+            raise InvalidToken("The specified alg value is not allowed")
+        try:
+            key.verify(
+                _b64decode(signature_segment),
+                f"{header_segment}.{payload_segment}".encode("ascii"),
+                padding.PKCS1v15(),
+                _RSA_HASHES[algorithm](),
+            )
+            claims = json.loads(_b64decode(payload_segment))
+        except InvalidSignature as e:
+            raise InvalidToken("Signature verification failed.") from e
+        except Exception as e:
+            raise InvalidToken("Invalid payload string.") from e
+        if not isinstance(claims, dict):
+            raise InvalidToken("Invalid payload string: must be a json object")
+        _validate_claims(claims, audience, issuer)
+        return claims
+
+
+JWT_BACKENDS = {"jose": JoseBackend, "cryptography": CryptographyBackend}
+
+
+def _jwt_backend(name: str):
+    if name not in JWT_BACKENDS:
+        raise ValueError(f"unknown JWT_BACKEND {name!r}")
+    return JWT_BACKENDS[name]()
@@ -0,0 +1,129 @@
+import json
+import logging
+import re
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Used when the JWKS response has no usable Cache-Control max-age
+DEFAULT_MAX_AGE = 3600
+# Keys are considered fresh for at least this long, whatever max-age says
+MIN_MAX_AGE = 300
+# At most one refresh for unknown kids per this many seconds
+MIN_REFRESH_INTERVAL = 30
+# Failed fetches are retried after 1, 2, 4, ... seconds, up to this many
+MAX_BACKOFF = 300
+
+_MAX_AGE = re.compile(r"(?:^|,)\s*max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+def _max_age(cache_control: str | None):
+    if cache_control is None:
+        return DEFAULT_MAX_AGE
+    if "no-cache" in cache_control.lower() or "no-store" in cache_control.lower():
+        return MIN_MAX_AGE
+    match = _MAX_AGE.search(cache_control)
+    return max(int(match.group(1)), MIN_MAX_AGE) if match else DEFAULT_MAX_AGE
+
+
+class KeyStore:
+    """
+    The signing keys of a JWKS, indexed by kid and parsed once into key
+    objects. Fetched on first use; once the response's max-age (at least
+    MIN_MAX_AGE) has passed, known keys keep being served while a background
+    thread refreshes them. Only a token with an unknown kid waits for a fetch,
+    at most once per MIN_REFRESH_INTERVAL. If a fetch fails the current keys
+    stay in use and retries back off. `load_key` turns a JWK into the JWT
+    backend's key object; `fetch` is requests.get or a stand-in.
+    """
+
+    def __init__(
+        self, url: str, load_key, algorithm: str = "RS256", fetch=requests.get
+    ):
+        self.url = url
+        self.load_key = load_key
+        self.algorithm = algorithm
+        self.fetch = fetch
+        self._keys = {}
+        self._expires = 0.0
+        self._next_refresh = 0.0
+        self._failures = 0
+        self._lock = threading.Lock()
+        # Held for as long as a background refresh is in flight
+        self._background = threading.Lock()
+        self._refresh_thread = None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def load(self, jwks: dict, max_age: int = DEFAULT_MAX_AGE):
+        keys = {}
+        for key in jwks.get("keys", []):
+            if key.get("use", "sig") != "sig" or "kid" not in key:
+                continue
+            try:
+                keys[key["kid"]] = self.load_key(key, self.algorithm)
+            except Exception as e:
+                logger.warning("skipping JWKS key %s: %s", key.get("kid"), e)
+        self._keys = keys
+        self._expires = time.monotonic() + max_age
+
+    def load_file(self, path: str):
+        # A bundled JWKS, so a cold start can verify tokens without the network
+        with open(path) as f:
+            self.load(json.load(f))
+
+    def get(self, kid: str):
+        """
+        The key for `kid`, else None. Stale keys are returned as they are and
+        refreshed in the background; only an unknown kid waits for a fetch.
+        """
+        key = self._keys.get(kid)
+        if key is None:
+            self.refresh()
+            return self._keys.get(kid)
+        now = time.monotonic()
+        if now >= self._expires and now >= self._next_refresh:
+            self._refresh_in_background()
+        return key
+
+    def _refresh_in_background(self):
+        # Never waits: skipped while another background refresh is running
+        if not self._background.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._background.release()
+
+        self._refresh_thread = threading.Thread(target=run, daemon=True)
+        self._refresh_thread.start()
+
+    def refresh(self):
+        now = time.monotonic()
+        if now < self._next_refresh:
+            return
+        with self._lock:
+            # Another thread may have refreshed while this one waited
+            if time.monotonic() < self._next_refresh:
+                return
+            try:
+                response = self.fetch(self.url, timeout=5)
+                response.raise_for_status()
+                self.load(
+                    response.json(), _max_age(response.headers.get("Cache-Control"))
+                )
+                self._failures = 0
+                self._next_refresh = time.monotonic() + MIN_REFRESH_INTERVAL
+            except Exception as e:
+                self._failures += 1
+                backoff = min(2 ** (self._failures - 1), MAX_BACKOFF)
+                self._next_refresh = time.monotonic() + backoff
+                # The current keys stay in use until the retry
+                self._expires = max(self._expires, self._next_refresh)
+                logger.warning("JWKS refresh failed, retrying in %ss: %s", backoff, e)
@@ -1,40 +1,37 @@
+import hashlib
 import json
 import os
 import threading
 import time
-from flask import abort, request
+from collections import OrderedDict
+from flask import abort, g, request
 from functools import wraps
-from jose import jwt
-import requests
+
+from auth.backends import InvalidClaims, InvalidToken, TokenExpired, _jwt_backend
+from auth.jwks import KeyStore
 from dotenv import load_dotenv
 
 load_dotenv()
 AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN")
 ALGORITHMS = [os.getenv("ALGORITHMS", "")]
 API_AUDIENCE = os.getenv("API_AUDIENCE")
-jwks = None
-
-
-# Note: I would find a better way to do this in production. For some reason,
-# all calls to the API hang in AWS if I fetch JWKS in the verify_decode_jwt method below.
-# So one approach is to simply run a thread that refreshes the JWKS every hour.
-def fetch_jwks():
-    global jwks
-    while True:
-        try:
-            response = requests.get(
-                f"https://{AUTH0_DOMAIN}/.well-known/jwks.json", timeout=20
-            )
-            if response.status_code < 300:
-                jwks = response.json()
-        except Exception as e:
-            print(f"EXCEPTION: {e}")
+# Verified tokens are reused until TOKEN_CACHE_SKEW seconds before they expire
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 1024))
+TOKEN_CACHE_SKEW = int(os.getenv("TOKEN_CACHE_SKEW", 30))
 
-        time.sleep(3600)
+# jose (python-jose) or cryptography; see auth/backends.py
+JWT_BACKEND = os.getenv("JWT_BACKEND", "jose")
 
-
-jwks_thread = threading.Thread(target=fetch_jwks, daemon=True)
-jwks_thread.start()
+jwt_backend = _jwt_backend(JWT_BACKEND)
+# Keys are fetched on first use rather than at import. JWKS_FILE points at a
+# saved copy of the JWKS, so tokens verify before the first fetch completes.
+key_store = KeyStore(
+    f"https://{AUTH0_DOMAIN}/.well-known/jwks.json",
+    jwt_backend.load_key,
+    ALGORITHMS[0] or "RS256",
+)
+if os.getenv("JWKS_FILE"):
+    key_store.load_file(os.getenv("JWKS_FILE"))
 
 
 class AuthError(Exception):
@@ -43,6 +40,67 @@ class AuthError(Exception):
         self.status_code = status_code
 
 
+class VerifiedClaims(dict):
+    """A verified token payload, with its permissions as a set for check_permissions."""
+
+    def __init__(self, payload: dict):
+        super().__init__(payload)
+        permissions = payload.get("permissions")
+        self.permission_set = (
+            frozenset(permissions) if isinstance(permissions, list) else permissions
+        )
+
+
+class TokenCache:
+    """
+    Bounded LRU of verified claims keyed by a SHA-256 digest of the token, so
+    a session's repeated requests skip the signature check. Entries expire
+    `skew` seconds before the token's exp; tokens without exp aren't cached.
+    """
+
+    def __init__(self, max_entries: int, skew: int):
+        self.max_entries = max_entries
+        self.skew = skew
+        self._entries = OrderedDict()  # digest -> (expires, claims)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, token: str):
+        digest = hashlib.sha256(token.encode()).digest()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return entry[1]
+
+    def set(self, token: str, claims: VerifiedClaims):
+        exp = claims.get("exp")
+        if self.max_entries <= 0 or not isinstance(exp, (int, float)):
+            return
+        expires = exp - self.skew
+        if expires <= time.time():
+            return
+        digest = hashlib.sha256(token.encode()).digest()
+        with self._lock:
+            self._entries[digest] = (expires, claims)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_SKEW)
+
+
 def get_token_auth_header():
     # Partially taken from lesson 2.15 Practice - Applying Skills in Flask from the IAM course
     if "Authorization" not in request.headers:
@@ -63,52 +121,58 @@ def check_permissions(permission, payload):
     if "permissions" not in payload:
         # We do not include descriptive error information for security's sake
         raise AuthError({"code": "forbidden", "description": "Forbidden"}, 403)
-    if permission not in payload["permissions"]:
+    if isinstance(payload, VerifiedClaims):
+        permissions = payload.permission_set
+    else:
+        permissions = payload["permissions"]
+    if permission not in permissions:
         # We do not include descriptive error information for security's sake
         raise AuthError({"code": "forbidden", "description": "Forbidden"}, 403)
     return True
 
 
 def verify_decode_jwt(token):
-    if not jwks:
-        raise AuthError({"code": "jwks_failure", "description": "jwks failure"}, 500)
+    claims = token_cache.get(token)
+    if claims is not None:
+        return claims
 
-    unverified_header = jwt.get_unverified_header(token)
+    try:
+        unverified_header = jwt_backend.get_unverified_header(token)
+    except InvalidToken:
+        raise AuthError(
+            {"code": "invalid_header", "description": "Authorization malformed."}, 401
+        )
 
-    rsa_key = {}
     if "kid" not in unverified_header:
         raise AuthError(
             {"code": "invalid_header", "description": "Authorization malformed."}, 401
         )
 
-    for key in jwks["keys"]:
-        if key["kid"] == unverified_header["kid"]:
-            rsa_key = {
-                "kty": key["kty"],
-                "kid": key["kid"],
-                "use": key["use"],
-                "n": key["n"],
-                "e": key["e"],
-            }
-
-    if rsa_key:
+    key = key_store.get(unverified_header["kid"])
+    if key is None and not len(key_store):
+        # Neither fetched nor loaded from JWKS_FILE yet
+        raise AuthError({"code": "jwks_failure", "description": "jwks failure"}, 500)
+
+    if key is not None:
         try:
-            payload = jwt.decode(
+            payload = jwt_backend.decode(
                 token,
-                rsa_key,
+                key,
                 algorithms=ALGORITHMS,
                 audience=API_AUDIENCE,
                 issuer=f"https://{AUTH0_DOMAIN}/",
             )
 
-            return payload
+            claims = VerifiedClaims(payload)
+            token_cache.set(token, claims)
+            return claims
 
-        except jwt.ExpiredSignatureError:  # type: ignore
+        except TokenExpired:
             raise AuthError(
                 {"code": "token_expired", "description": "Token expired."}, 401
             )
 
-        except jwt.JWTClaimsError:  # type: ignore
+        except InvalidClaims:
             raise AuthError(
                 {
                     "code": "invalid_claims",
@@ -133,14 +197,20 @@ def verify_decode_jwt(token):
     )
 
 
-def requires_auth(permission=""):
+def requires_auth(permission="", *permissions):
+    # Every given permission is required, e.g. requires_auth("create:casts", "delete:casts")
+    required = (permission, *permissions)
+
     def requires_auth_decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
             try:
                 token = get_token_auth_header()
                 payload = verify_decode_jwt(token)
-                check_permissions(permission, payload)
+                for name in required:
+                    check_permissions(name, payload)
+                # Part of the response cache key
+                g.permission = " ".join(required)
                 return f(*args, **kwargs)
             except AuthError as e:
                 abort(e.status_code, e)
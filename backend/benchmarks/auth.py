@@ -0,0 +1,76 @@
+"""
+Cost of authorization per JWT backend, with locally generated keys and
+tokens; no database or network is needed.
+
+    python -m benchmarks.auth
+
+Reports the verification throughput of each backend's decode alone, then the
+per-request cost of what requires_auth does (header parsing,
+verify_decode_jwt, check_permissions) with and without the token cache.
+"""
+
+from unittest.mock import patch
+
+from flask import Flask
+
+from auth import validator
+from auth.backends import JWT_BACKENDS
+from auth.jwks import KeyStore
+from auth.validator import (
+    TokenCache,
+    check_permissions,
+    get_token_auth_header,
+    verify_decode_jwt,
+)
+from benchmarks.common import measure, report
+from tests.auth_tests import AUDIENCE, DOMAIN, make_key, make_token
+
+
+def main():
+    private_pem, public_jwk = make_key("bench-key")
+    token = make_token(private_pem, "bench-key")
+    app = Flask(__name__)
+
+    def authorize():
+        # What requires_auth does before calling the view
+        payload = verify_decode_jwt(get_token_auth_header())
+        check_permissions("read:actors", payload)
+
+    throughput = []
+    per_request = []
+    for name, backend_class in JWT_BACKENDS.items():
+        backend = backend_class()
+        key = backend.load_key(public_jwk, "RS256")
+        ms = measure(
+            lambda: backend.decode(
+                token, key, ["RS256"], AUDIENCE, f"https://{DOMAIN}/"
+            ),
+            2000,
+            50,
+        )
+        throughput.append((f"{name} ({1000 / ms:,.0f} verifications/s)", ms))
+
+        key_store = KeyStore("", backend.load_key)
+        key_store.load({"keys": [public_jwk]})
+        with (
+            app.test_request_context(headers={"Authorization": f"Bearer {token}"}),
+            patch.object(validator, "jwt_backend", backend),
+            patch.object(validator, "key_store", key_store),
+            patch.object(validator, "AUTH0_DOMAIN", DOMAIN),
+            patch.object(validator, "API_AUDIENCE", AUDIENCE),
+            patch.object(validator, "ALGORITHMS", ["RS256"]),
+        ):
+            for label, cache in (
+                ("verify every time", TokenCache(0, 30)),
+                ("token cache", TokenCache(1024, 30)),
+            ):
+                with patch.object(validator, "token_cache", cache):
+                    per_request.append(
+                        (f"{name}, {label}", measure(authorize, 2000, 50))
+                    )
+    report("RS256 decode and verify (2048-bit key)", throughput)
+    report("Authorization per request (one session's token)", per_request)
+
+
+if __name__ == "__main__":
+    main()
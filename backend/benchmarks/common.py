@@ -0,0 +1,103 @@
+"""
+Shared setup for the benchmark scripts. Benchmarks drop and re-create the
+tables in their own database, so never point them at real data:
+
+    createdb casting_bench
+    export BENCHMARK_DATABASE_URL=postgresql://postgres@localhost:5432/casting_bench
+    python -m benchmarks.list_count_modes
+"""
+
+import os
+import statistics
+import time
+from functools import wraps
+from unittest.mock import patch
+
+from sqlalchemy import text
+
+
+def _skip_auth(*args, **kwargs):
+    # Same approach as the tests: measure the endpoint, not the JWT check
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*inner_args, **inner_kwargs):
+            return f(*inner_args, **inner_kwargs)
+
+        return decorated_function
+
+    return decorator
+
+
+patch("auth.validator.requires_auth", _skip_auth).start()
+
+from app import create_app  # noqa: E402
+from models import db  # noqa: E402
+
+
+def make_app():
+    database_path = os.environ["BENCHMARK_DATABASE_URL"]
+    if database_path.startswith("postgres://"):
+        database_path = database_path.replace("postgres://", "postgresql://", 1)
+    return create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": database_path,
+            "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+        }
+    )
+
+
+def seed(app, actors: int, movies: int = 0, casts_per_movie: int = 0):
+    # Bulk-generated in SQL; going through the ORM would dominate the run time
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(
+            text(
+                "INSERT INTO actors (name, age, gender) "
+                "SELECT 'Actor ' || lpad(g::text, 7, '0'), 20 + g % 60, 'MALE' "
+                "FROM generate_series(1, :n) g"
+            ),
+            {"n": actors},
+        )
+        db.session.execute(
+            text(
+                "INSERT INTO movies (title, genre, release_date) "
+                "SELECT 'Movie ' || lpad(g::text, 7, '0'), 'DRAMA', "
+                "date '2000-01-01' + g % 7000 "
+                "FROM generate_series(1, :n) g"
+            ),
+            {"n": movies},
+        )
+        db.session.execute(
+            text(
+                "INSERT INTO casts (movie_id, actor_id) "
+                "SELECT m.id, 1 + (m.id * 7919 + k * 104729) % :actors "
+                "FROM movies m, generate_series(1, :k) k "
+                "ON CONFLICT DO NOTHING"
+            ),
+            {"actors": actors, "k": casts_per_movie},
+        )
+        db.session.commit()
+        with db.engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT"
+        ) as connection:
+            connection.execute(text("VACUUM ANALYZE"))
+
+
+def measure(fn, repeat: int = 50, warmup: int = 5):
+    """Median wall time of fn() in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def report(title: str, rows: list[tuple[str, float]]):
+    print(f"\n{title}")
+    width = max(len(label) for label, _ in rows)
+    for label, ms in rows:
+        print(f"  {label.ljust(width)}  {ms:9.3f} ms")
@@ -0,0 +1,61 @@
+"""
+Cost of the ETag in GET /actors/<id>: hashing format() as before against the
+version column, alone and as part of the whole request.
+
+    python -m benchmarks.etags
+"""
+
+import hashlib
+import json
+from unittest.mock import patch
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
+
+from benchmarks.common import make_app, measure, report, seed
+from models import Actor, Cast, db
+
+
+def _hashed_etag(record: Actor):
+    # _create_etag before version counters
+    dumped = json.dumps(record.format(), sort_keys=True)
+    return hashlib.sha256(dumped.encode()).hexdigest()
+
+
+def main():
+    app = make_app()
+    seed(app, actors=10_000, movies=20_000, casts_per_movie=20)
+    client = app.test_client()
+
+    with app.app_context():
+        actor_id, movies = db.session.execute(
+            select(Cast.actor_id, func.count())
+            .group_by(Cast.actor_id)
+            .order_by(func.count().desc())
+            .limit(1)
+        ).one()
+
+        def hashed():
+            db.session.expire_all()
+            query = Actor.query.options(joinedload(Actor.movies))
+            _hashed_etag(query.filter(Actor.id == actor_id).one())
+
+        def versioned():
+            db.session.execute(
+                select(Actor.id, Actor.version).where(Actor.id == actor_id)
+            ).one()
+
+        rows = [
+            ("ETag: load movies + sha256 (before)", measure(hashed, 200)),
+            ("ETag: SELECT version (after)", measure(versioned, 200)),
+        ]
+
+    url = f"/actors/{actor_id}"
+    with patch("actors.actors_controller._create_etag", _hashed_etag):
+        rows.append((f"GET {url} (before)", measure(lambda: client.get(url), 200)))
+    rows.append((f"GET {url} (after)", measure(lambda: client.get(url), 200)))
+    report(f"Actor with {movies} movies", rows)
+
+
+if __name__ == "__main__":
+    main()
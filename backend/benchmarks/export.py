@@ -0,0 +1,65 @@
+"""
+Throughput and peak memory of GET /actors/export on a large table.
+
+    python -m benchmarks.export
+
+BENCHMARK_ROWS controls the table size (default 1,000,000). Peak RSS only ever
+grows, so the buffered baseline runs last.
+"""
+
+import os
+import resource
+import time
+
+from benchmarks.common import make_app, seed
+from models import Actor
+from utilities.serializers import _serializer
+
+ROWS = int(os.environ.get("BENCHMARK_ROWS", 1_000_000))
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run(label: str, fn):
+    before = _peak_rss_mb()
+    start = time.perf_counter()
+    lines = fn()
+    seconds = time.perf_counter() - start
+    print(
+        f"  {label.ljust(34)}  {lines:>9,} rows  {seconds:7.2f} s  "
+        f"peak RSS +{_peak_rss_mb() - before:7.1f} MB"
+    )
+
+
+def main():
+    app = make_app()
+    seed(app, actors=ROWS)
+    client = app.test_client()
+
+    def streamed():
+        # Consume the body chunk by chunk like a WSGI server would
+        res = client.get("/actors/export")
+        lines = sum(chunk.count(b"\n") for chunk in res.response)
+        res.close()
+        return lines
+
+    def buffered():
+        # What a dump looked like before: every row loaded, then one big body
+        with app.app_context():
+            serialize = _serializer(Actor)
+            body = "".join(
+                app.json.dumps(serialize(actor)) + "\n"
+                for actor in Actor.query.order_by(Actor.id).all()
+            )
+        return body.count("\n")
+
+    print(f"\n{ROWS:,} actors")
+    _run("GET /actors/export (streamed)", streamed)
+    _run("ORM .all() + one body (before)", buffered)
+
+
+if __name__ == "__main__":
+    main()
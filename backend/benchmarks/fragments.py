@@ -0,0 +1,56 @@
+"""
+CPU time per GET /movies?include=actors on a page of heavily cast movies,
+serialized in full against assembled from cached per-record fragments.
+
+    python -m benchmarks.fragments
+
+BENCHMARK_CASTS controls the actors per movie (default 50). Every request gets
+a new query string, so the whole-response cache never answers and only the
+fragments are reused.
+"""
+
+import itertools
+import os
+import statistics
+import time
+
+from benchmarks.common import make_app, seed
+from utilities.cache import MemoryBackend, ResponseCache
+
+CASTS = int(os.environ.get("BENCHMARK_CASTS", 50))
+URL = "/movies?limit=100&include=actors&count=none"
+
+
+def _cpu_ms(fn, repeat: int = 30, warmup: int = 5):
+    # Median process CPU time: the database's share happens in another process
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.process_time()
+        fn()
+        samples.append((time.process_time() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    app = make_app()
+    seed(app, actors=20_000, movies=2_000, casts_per_movie=CASTS)
+    client = app.test_client()
+    counter = itertools.count()
+
+    def get():
+        return client.get(f"{URL}&x={next(counter)}")
+
+    print(f"\nGET {URL}, {CASTS} actors per movie (CPU ms per request)")
+    print(f"  {'serialized (no cache)'.ljust(26)}  {_cpu_ms(get):9.3f} ms")
+    app.extensions["response_cache"] = ResponseCache(MemoryBackend(100_000))
+    print(f"  {'fragments (memory)'.ljust(26)}  {_cpu_ms(get):9.3f} ms")
+    stats = app.extensions["response_cache"].stats()
+    print(
+        f"  fragment hits {stats['fragmentHits']:,}, misses {stats['fragmentMisses']:,}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Serialization throughput of the JSON providers: encoding a 100-actor list
+payload into a response, and GET /actors?limit=100 end to end.
+
+    python -m benchmarks.json_provider
+"""
+
+from benchmarks.common import make_app, measure, report, seed
+from benchmarks.serializers import make_page
+from models import Actor
+from utilities.json_provider import OrjsonProvider, StdlibJSONProvider
+from utilities.serializers import _serializer
+
+
+def main():
+    app = make_app()
+    seed(app, actors=1000, movies=200, casts_per_movie=10)
+    client = app.test_client()
+    serialize = _serializer(Actor, None, "movies")
+    payload = {
+        "actors": [serialize(actor) for actor in make_page()],
+        "offset": 0,
+        "success": True,
+        "totalActors": 100,
+    }
+
+    rows = []
+    for provider in (StdlibJSONProvider(app), OrjsonProvider(app)):
+        name = type(provider).__name__
+        app.json = provider
+        with app.app_context():
+            encode_ms = measure(lambda: provider.response(payload), 200)
+        request_ms = measure(lambda: client.get("/actors?limit=100"), 50)
+        rows.append((f"{name}: encode 100 actors x 5 movies", encode_ms))
+        rows.append((f"{name}: GET /actors?limit=100", request_ms))
+    report("JSON provider throughput (ms per response)", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Latency of GET /actors under each ?count= mode on a large table.
+
+    python -m benchmarks.list_count_modes
+
+BENCHMARK_ROWS controls the table size (default 1,000,000).
+"""
+
+import os
+
+from sqlalchemy import text
+
+from benchmarks.common import make_app, measure, report, seed
+from models import db
+
+ROWS = int(os.environ.get("BENCHMARK_ROWS", 1_000_000))
+
+
+def main():
+    app = make_app()
+    seed(app, actors=ROWS)
+    client = app.test_client()
+
+    def two_queries(search: str):
+        # What every list request did before count modes: COUNT(*) + page
+        def run():
+            with app.app_context():
+                db.session.execute(
+                    text("SELECT count(*) FROM actors WHERE name ILIKE :s"),
+                    {"s": f"%{search}%"},
+                ).scalar()
+                db.session.execute(
+                    text(
+                        "SELECT * FROM actors WHERE name ILIKE :s "
+                        "ORDER BY name, id LIMIT 10"
+                    ),
+                    {"s": f"%{search}%"},
+                ).all()
+
+        return run
+
+    for label, search in (("unfiltered", ""), ("filtered", "Actor 00001")):
+        rows = [("count + page (SQL only, before)", measure(two_queries(search), 10))]
+        for mode in ("exact", "estimated", "none"):
+            url = f"/actors?count={mode}&search={search}"
+            rows.append(
+                (f"GET /actors?count={mode}", measure(lambda: client.get(url), 10))
+            )
+        report(f"{ROWS:,} actors, {label}", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+GET /actors and GET /movies with ?render=orm against ?render=db, where
+PostgreSQL builds the JSON for each record.
+
+    python -m benchmarks.render_modes
+
+BENCHMARK_ROWS controls the number of actors (default 100,000).
+"""
+
+import os
+
+from benchmarks.common import make_app, measure, report, seed
+
+ROWS = int(os.environ.get("BENCHMARK_ROWS", 100_000))
+
+
+def main():
+    app = make_app()
+    seed(app, actors=ROWS, movies=ROWS // 5, casts_per_movie=10)
+    client = app.test_client()
+
+    for url in (
+        "/actors?limit=100&count=none",
+        "/actors?limit=100&include=movies&count=none",
+        "/movies?limit=100&include=actors&count=none",
+        "/actors?limit=100&include=movies",
+    ):
+        rows = []
+        for mode in ("orm", "db"):
+            full = f"{url}&render={mode}"
+            rows.append((f"render={mode}", measure(lambda: client.get(full), 30)))
+        report(f"GET {url}", rows)
+
+
+if __name__ == "__main__":
+    main()
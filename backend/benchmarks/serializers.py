@@ -0,0 +1,65 @@
+"""
+CPU cost of building a 100-actor list payload: format() + _camel_case_dict
+against the precompiled serializers. No database round trips are involved.
+
+    python -m benchmarks.serializers
+"""
+
+from datetime import date
+
+from benchmarks.common import make_app, measure, report
+from models import Actor, Gender, Genre, Movie
+from utilities.serializers import _serializer
+from utilities.utilities import _camel_case_dict
+
+
+def make_page(size: int = 100, movies_per_actor: int = 5):
+    movies = [
+        Movie(
+            genre=Genre.DRAMA,
+            title=f"Movie {i:03}",
+            release_date=date(2000, 1, 1),
+            poster_url="https://example.com/poster.jpg",
+        )
+        for i in range(movies_per_actor * 4)
+    ]
+    actors = []
+    for i in range(size):
+        actor = Actor(
+            name=f"Actor {i:03}",
+            age=40,
+            photo_url="https://example.com/photo.jpg",
+            gender=Gender.FEMALE,
+        )
+        actor.id = i + 1
+        actor.movies = movies[i % 4 :: 4][:movies_per_actor]
+        actors.append(actor)
+    for i, movie in enumerate(movies):
+        movie.id = i + 1
+    return actors
+
+
+def main():
+    app = make_app()
+    actors = make_page()
+    serialize = _serializer(Actor, None, "movies")
+
+    def before():
+        return _camel_case_dict({"actors": [actor.format() for actor in actors]})
+
+    def after():
+        return {"actors": [serialize(actor) for actor in actors]}
+
+    with app.app_context():
+        assert app.json.dumps(before()) == app.json.dumps(after())
+        report(
+            "100 actors x 5 movies, dict building only",
+            [
+                ("format() + _camel_case_dict", measure(before, 200)),
+                ("_serializer(Actor, None, 'movies')", measure(after, 200)),
+            ],
+        )
+
+
+if __name__ == "__main__":
+    main()
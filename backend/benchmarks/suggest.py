@@ -0,0 +1,39 @@
+"""
+Typeahead latency: GET /actors/suggest against the list endpoint the
+Autosearch components used before.
+
+    python -m benchmarks.suggest
+
+BENCHMARK_ROWS controls the number of actors (default 200,000).
+"""
+
+import os
+
+from benchmarks.common import make_app, measure, report, seed
+
+ROWS = int(os.environ.get("BENCHMARK_ROWS", 200_000))
+
+
+def main():
+    app = make_app()
+    seed(app, actors=ROWS, movies=ROWS // 10, casts_per_movie=10)
+    client = app.test_client()
+
+    for search in ("Actor 0001", "Actor 000123"):
+        report(
+            f"{ROWS:,} actors, search={search!r}",
+            [
+                (
+                    "GET /actors?page=1&search=",
+                    measure(lambda: client.get(f"/actors?page=1&search={search}"), 20),
+                ),
+                (
+                    "GET /actors/suggest?search=",
+                    measure(lambda: client.get(f"/actors/suggest?search={search}"), 20),
+                ),
+            ],
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from flask import Flask, abort, jsonify, request
-from models import Cast
+from models import Cast, _insert_cast
+from utilities.export import _ndjson_export
 from auth.validator import requires_auth
 
 
@@ -20,19 +21,22 @@ def casts_controller(app: Flask):
         movie_id = body.get("movieId")
         actor_id = body.get("actorId")
 
+        result = _insert_cast(movie_id, actor_id)
+        if result == "missing":
+            abort(404)
+        if result == "exists":
+            abort(409)
+        return (
+            jsonify({"success": True, "id": f"movie-{movie_id}-actor-{actor_id}"}),
+            201,
+        )
+
+    @app.route("/casts/export", methods=["GET"])
+    @requires_auth("read:movies")
+    def export_casts():
         try:
-            cast = Cast(movie_id=movie_id, actor_id=actor_id)
-            cast.add()
-            return (
-                jsonify(
-                    {
-                        "success": True,
-                        "id": f"movie-{cast.movie_id}-actor-{cast.actor_id}",
-                    }
-                ),
-                201,
-            )
-        except:
+            return _ndjson_export(Cast, Cast.created_at, [Cast.movie_id, Cast.actor_id])
+        except ValueError:
             abort(400)
 
     @app.route("/casts/movies/<int:movie_id>/actors/<int:actor_id>", methods=["DELETE"])
@@ -44,6 +44,16 @@ target_db = current_app.extensions["migrate"].db
 # ... etc.
 
 
+# Indexes that only the migrations create: trigram GIN indexes over
+# f_unaccent(), which the models can't declare since db.create_all() has no
+# pg_trgm or unaccent. Without this, autogenerate would drop them.
+MIGRATION_ONLY_INDEXES = {"ix_actors_name_trgm", "ix_movies_title_trgm"}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    return not (type_ == "index" and reflected and name in MIGRATION_ONLY_INDEXES)
+
+
 def get_metadata():
     if hasattr(target_db, "metadatas"):
         return target_db.metadatas[None]
@@ -63,7 +73,12 @@ def run_migrations_offline():
 
     """
     url = config.get_main_option("sqlalchemy.url")
-    context.configure(url=url, target_metadata=get_metadata(), literal_binds=True)
+    context.configure(
+        url=url,
+        target_metadata=get_metadata(),
+        literal_binds=True,
+        include_object=include_object,
+    )
 
     with context.begin_transaction():
         context.run_migrations()
@@ -90,6 +105,7 @@ def run_migrations_online():
     conf_args = current_app.extensions["migrate"].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_object", include_object)
 
     connectable = get_engine()
 
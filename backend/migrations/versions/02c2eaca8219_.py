@@ -0,0 +1,44 @@
+"""trigram search indexes for actor names and movie titles
+
+Revision ID: 02c2eaca8219
+Revises: 5c4cfcaa6d00
+Create Date: 2026-10-18 09:12:41.118204
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "02c2eaca8219"
+down_revision = "5c4cfcaa6d00"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    # unaccent() is only STABLE (it depends on the search_path), so it cannot be
+    # used in an index expression. Pin the dictionary and mark the wrapper IMMUTABLE.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+        AS $func$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $func$
+        """
+    )
+    op.execute(
+        "CREATE INDEX ix_actors_name_trgm ON actors "
+        "USING gin (lower(f_unaccent(name)) gin_trgm_ops)"
+    )
+    op.execute(
+        "CREATE INDEX ix_movies_title_trgm ON movies "
+        "USING gin (lower(f_unaccent(title)) gin_trgm_ops)"
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_movies_title_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_actors_name_trgm")
+    op.execute("DROP FUNCTION IF EXISTS f_unaccent(text)")
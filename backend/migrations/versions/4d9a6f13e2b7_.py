@@ -0,0 +1,30 @@
+"""per-table change counters for collection ETags
+
+Revision ID: 4d9a6f13e2b7
+Revises: c81e4b07d2f5
+Create Date: 2026-10-18 15:48:30.271946
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "4d9a6f13e2b7"
+down_revision = "c81e4b07d2f5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "table_versions",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade():
+    op.drop_table("table_versions")
@@ -0,0 +1,32 @@
+"""composite indexes for keyset pagination
+
+Revision ID: 5bcbbc1fc430
+Revises: 02c2eaca8219
+Create Date: 2026-10-18 10:03:27.540113
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "5bcbbc1fc430"
+down_revision = "02c2eaca8219"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("actors", schema=None) as batch_op:
+        batch_op.create_index("ix_actors_name_id", ["name", "id"], unique=False)
+
+    with op.batch_alter_table("movies", schema=None) as batch_op:
+        batch_op.create_index("ix_movies_title_id", ["title", "id"], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table("movies", schema=None) as batch_op:
+        batch_op.drop_index("ix_movies_title_id")
+
+    with op.batch_alter_table("actors", schema=None) as batch_op:
+        batch_op.drop_index("ix_actors_name_id")
@@ -0,0 +1,47 @@
+"""change timestamps for the NDJSON exports
+
+Revision ID: 7f3d2a91c4e8
+Revises: ba9c6e791667
+Create Date: 2026-10-18 13:02:41.118204
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "7f3d2a91c4e8"
+down_revision = "ba9c6e791667"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows get the migration time, so the first ?since= export includes them
+    for table, column in (
+        ("actors", "updated_at"),
+        ("movies", "updated_at"),
+        ("casts", "created_at"),
+    ):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(
+                sa.Column(
+                    column,
+                    sa.DateTime(timezone=True),
+                    server_default=sa.text("now()"),
+                    nullable=False,
+                )
+            )
+            batch_op.create_index(f"ix_{table}_{column}", [column], unique=False)
+
+
+def downgrade():
+    for table, column in (
+        ("casts", "created_at"),
+        ("movies", "updated_at"),
+        ("actors", "updated_at"),
+    ):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f"ix_{table}_{column}")
+            batch_op.drop_column(column)
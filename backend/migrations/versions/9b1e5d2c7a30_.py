@@ -0,0 +1,37 @@
+"""cascade deletes from actors and movies to casts
+
+Revision ID: 9b1e5d2c7a30
+Revises: 4d9a6f13e2b7
+Create Date: 2026-10-18 19:12:44.508213
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "9b1e5d2c7a30"
+down_revision = "4d9a6f13e2b7"
+branch_labels = None
+depends_on = None
+
+
+def _replace_foreign_keys(ondelete):
+    with op.batch_alter_table("casts", schema=None) as batch_op:
+        batch_op.drop_constraint("casts_movie_id_fkey", type_="foreignkey")
+        batch_op.drop_constraint("casts_actor_id_fkey", type_="foreignkey")
+        batch_op.create_foreign_key(
+            "casts_movie_id_fkey", "movies", ["movie_id"], ["id"], ondelete=ondelete
+        )
+        batch_op.create_foreign_key(
+            "casts_actor_id_fkey", "actors", ["actor_id"], ["id"], ondelete=ondelete
+        )
+
+
+def upgrade():
+    _replace_foreign_keys("CASCADE")
+
+
+def downgrade():
+    _replace_foreign_keys(None)
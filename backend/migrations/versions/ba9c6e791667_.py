@@ -0,0 +1,37 @@
+"""indexes for the typeahead suggest endpoints
+
+Revision ID: ba9c6e791667
+Revises: 5bcbbc1fc430
+Create Date: 2026-10-18 11:20:05.662910
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "ba9c6e791667"
+down_revision = "5bcbbc1fc430"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("casts", schema=None) as batch_op:
+        batch_op.create_index("ix_casts_actor_id", ["actor_id"], unique=False)
+
+    # Case-insensitive prefix lookups, e.g. lower(name) LIKE 'tom%'
+    op.execute(
+        "CREATE INDEX ix_actors_name_prefix ON actors (lower(name) text_pattern_ops)"
+    )
+    op.execute(
+        "CREATE INDEX ix_movies_title_prefix ON movies (lower(title) text_pattern_ops)"
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_movies_title_prefix")
+    op.execute("DROP INDEX IF EXISTS ix_actors_name_prefix")
+
+    with op.batch_alter_table("casts", schema=None) as batch_op:
+        batch_op.drop_index("ix_casts_actor_id")
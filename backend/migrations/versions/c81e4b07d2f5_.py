@@ -0,0 +1,31 @@
+"""version counters for ETags
+
+Revision ID: c81e4b07d2f5
+Revises: 7f3d2a91c4e8
+Create Date: 2026-10-18 14:37:12.504381
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c81e4b07d2f5"
+down_revision = "7f3d2a91c4e8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ("actors", "movies"):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(
+                sa.Column("version", sa.Integer(), server_default="1", nullable=False)
+            )
+
+
+def downgrade():
+    for table in ("movies", "actors"):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column("version")
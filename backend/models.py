@@ -2,9 +2,24 @@ import os
 import enum
 from typing import Optional
 from flask import Flask
-from sqlalchemy.orm import DeclarativeBase
-from datetime import date
-from sqlalchemy import Enum, Integer, String, Date
+from sqlalchemy.orm import DeclarativeBase, Session
+from datetime import date, datetime
+from sqlalchemy import (
+    Enum,
+    Integer,
+    String,
+    Date,
+    DateTime,
+    delete,
+    func,
+    or_,
+    event,
+    exists,
+    select,
+    true,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import mapped_column, Mapped
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
@@ -44,13 +59,36 @@ class Gender(enum.Enum):
 
 class Actor(db.Model):
     __tablename__ = "actors"
+    # Backs keyset pagination, which seeks on (name, id)
+    __table_args__ = (db.Index("ix_actors_name_id", "name", "id"),)
 
     age: Mapped[int] = mapped_column(Integer, nullable=False)
     gender: Mapped[Optional[Gender]] = mapped_column(Enum(Gender))
     id: Mapped[int] = mapped_column(db.Integer, primary_key=True)
-    movies = db.relationship("Movie", secondary="casts", back_populates="actors")
+    movies = db.relationship(
+        "Movie",
+        secondary="casts",
+        back_populates="actors",
+        # casts rows go with the actor (ON DELETE CASCADE), never loaded to delete
+        passive_deletes=True,
+        order_by=lambda: [Movie.title, Movie.id],
+    )
     name: Mapped[str] = mapped_column(String, nullable=False)
     photo_url: Mapped[Optional[str]] = mapped_column(String)
+    # Bookkeeping for exports; "internal" columns are left out of API responses
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        onupdate=func.now(),
+        index=True,
+        info={"internal": True},
+    )
+    # Bumped on every change to the record as the API shows it, related
+    # records included; ETags are derived from it
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=1, server_default="1", info={"internal": True}
+    )
 
     def __init__(
         self, name: str, age: int, photo_url: Optional[str], gender: Optional[Gender]
@@ -63,12 +101,16 @@ class Actor(db.Model):
     def __repr__(self):
         return f"<Actor {self.id}, {self.name}>"
 
+    # Responses are built by utilities.serializers (or rendered by the database);
+    # format() and format_for_collection() are kept only as the reference
+    # those are tested and benchmarked against.
     def format(self):
         return {
             "age": self.age,
             "gender": self.gender.value if self.gender else None,
             "id": self.id,
-            "movies": sorted([movie.format_for_collection() for movie in self.movies], key=lambda movie: movie["title"]),  # type: ignore
+            # Sorted by the database through the relationship's order_by
+            "movies": [movie.format_for_collection() for movie in self.movies],
             "name": self.name,
             "photo_url": self.photo_url,
         }
@@ -85,24 +127,35 @@ class Actor(db.Model):
 
     def add(self):
         db.session.add(self)
+        _touch_table(Actor)
         db.session.commit()
 
-    def update(self):
-        db.session.commit()
 
-    def delete(self):
-        db.session.delete(self)
-        db.session.commit()
+# Case-insensitive prefix lookups for typeahead, e.g. lower(name) LIKE 'tom%'
+db.Index(
+    "ix_actors_name_prefix",
+    func.lower(Actor.name).label("name_lower"),
+    postgresql_ops={"name_lower": "text_pattern_ops"},
+)
 
 
 class Cast(db.Model):
     __tablename__ = "casts"
+    # The primary key already leads with movie_id; this serves lookups by actor
+    __table_args__ = (db.Index("ix_casts_actor_id", "actor_id"),)
 
     movie_id: Mapped[int] = mapped_column(
-        db.ForeignKey("movies.id"), nullable=False, primary_key=True
+        db.ForeignKey("movies.id", ondelete="CASCADE"), nullable=False, primary_key=True
     )
     actor_id: Mapped[int] = mapped_column(
-        db.ForeignKey("actors.id"), nullable=False, primary_key=True
+        db.ForeignKey("actors.id", ondelete="CASCADE"), nullable=False, primary_key=True
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        index=True,
+        info={"internal": True},
     )
 
     def __init__(self, movie_id: int, actor_id: int):
@@ -111,10 +164,14 @@ class Cast(db.Model):
 
     def add(self):
         db.session.add(self)
+        _bump_versions(Actor, [self.actor_id])
+        _bump_versions(Movie, [self.movie_id])
         db.session.commit()
 
     def delete(self):
         db.session.delete(self)
+        _bump_versions(Actor, [self.actor_id])
+        _bump_versions(Movie, [self.movie_id])
         db.session.commit()
 
 
@@ -134,13 +191,34 @@ class Genre(enum.Enum):
 
 class Movie(db.Model):
     __tablename__ = "movies"
-
-    actors = db.relationship("Actor", secondary="casts", back_populates="movies")
+    # Backs keyset pagination, which seeks on (title, id)
+    __table_args__ = (db.Index("ix_movies_title_id", "title", "id"),)
+
+    actors = db.relationship(
+        "Actor",
+        secondary="casts",
+        back_populates="movies",
+        passive_deletes=True,
+        order_by=lambda: [Actor.name, Actor.id],
+    )
     genre: Mapped[Genre] = mapped_column(Enum(Genre), nullable=False)
     id: Mapped[int] = mapped_column(db.Integer, primary_key=True)
     poster_url: Mapped[Optional[str]] = mapped_column(String)
     release_date: Mapped[Optional[date]] = mapped_column(Date)
     title: Mapped[str] = mapped_column(String, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        onupdate=func.now(),
+        index=True,
+        info={"internal": True},
+    )
+    # Bumped on every change to the record as the API shows it, related
+    # records included; ETags are derived from it
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=1, server_default="1", info={"internal": True}
+    )
 
     def __init__(
         self,
@@ -160,9 +238,11 @@ class Movie(db.Model):
     def __repr__(self):
         return f"<Movie {self.id}, {self.title}>"
 
+    # Test and benchmark reference only, like Actor.format()
     def format(self):
         return {
-            "actors": sorted([actor.format_for_collection() for actor in self.actors], key=lambda actor: actor["name"]),  # type: ignore
+            # Sorted by the database through the relationship's order_by
+            "actors": [actor.format_for_collection() for actor in self.actors],
             "genre": self.genre.value,
             "id": self.id,
             "poster_url": self.poster_url,
@@ -190,11 +270,287 @@ class Movie(db.Model):
 
     def add(self):
         db.session.add(self)
+        _touch_table(Movie)
         db.session.commit()
 
-    def update(self):
-        db.session.commit()
 
-    def delete(self):
-        db.session.delete(self)
-        db.session.commit()
+db.Index(
+    "ix_movies_title_prefix",
+    func.lower(Movie.title).label("title_lower"),
+    postgresql_ops={"title_lower": "text_pattern_ops"},
+)
+
+
+class TableVersion(db.Model):
+    """
+    Change counter per table, bumped whenever any actor or movie changes as
+    the API shows it. Validates whole list responses in one primary key lookup.
+    """
+
+    __tablename__ = "table_versions"
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+def _bump_versions(model: type[Movie | Actor], ids):
+    # ids is a list or a subquery, locked in id order (see _lock_records)
+    locked = (
+        select(model.id)
+        .where(model.id.in_(ids))
+        .order_by(model.id)
+        .with_for_update(key_share=True)
+    )
+    bumped = (
+        db.session.execute(
+            update(model)
+            .where(model.id.in_(locked.scalar_subquery()))
+            .values(version=model.version + 1)
+            .returning(model.id)
+            .execution_options(synchronize_session=False)
+        )
+        .scalars()
+        .all()
+    )
+    if bumped:
+        _touch_table(model, *bumped)
+
+
+def _lock_records(ids_by_model: dict):
+    """
+    Locks the records a transaction will write or bump, actors before movies,
+    each by ascending id, so writers queue instead of deadlocking. Takes and
+    returns lists (or subqueries) of ids per model; only existing ids come back.
+    """
+    locked = {}
+    for model in (Actor, Movie):
+        if model in ids_by_model:
+            locked[model] = (
+                db.session.execute(
+                    select(model.id)
+                    .where(model.id.in_(ids_by_model[model]))
+                    .order_by(model.id)
+                    .with_for_update(key_share=True)
+                )
+                .scalars()
+                .all()
+            )
+    return locked
+
+
+def _cast_columns(model: type[Movie | Actor]):
+    # (casts column for `model`, casts column for the related model, that model)
+    if model is Actor:
+        return Cast.actor_id, Cast.movie_id, Movie
+    return Cast.movie_id, Cast.actor_id, Actor
+
+
+def _lock_actors_first(model: type[Movie | Actor], record_id: int):
+    # A movie write bumps its actors, which must be locked before the movie
+    if model is Movie:
+        _lock_records({Actor: select(Cast.actor_id).where(Cast.movie_id == record_id)})
+
+
+def _update_if_changed(
+    model: type[Movie | Actor],
+    record_id: int,
+    values: dict,
+    versions: list[int] | None = None,
+):
+    """
+    Writes `values` in one UPDATE if any of them changed and, unless `versions`
+    is None, the version is one of them. Returns the new version or None.
+    Not committed.
+    """
+    if not values:
+        return None
+    changed = or_(
+        *(getattr(model, key).is_distinct_from(value) for key, value in values.items())
+    )
+    statement = (
+        update(model)
+        .where(model.id == record_id, changed)
+        .values(version=model.version + 1, **values)
+        .returning(model.version)
+    )
+    if versions is not None:
+        statement = statement.where(model.version.in_(versions))
+    own, other, related = _cast_columns(model)
+    _lock_actors_first(model, record_id)
+    version = db.session.execute(
+        statement, execution_options={"synchronize_session": False}
+    ).scalar()
+    if version is not None:
+        _touch_table(model, record_id)
+        _bump_versions(related, select(other).where(own == record_id))
+    return version
+
+
+def _delete_if_current(
+    model: type[Movie | Actor], record_id: int, versions: list[int] | None = None
+):
+    """
+    Deletes the record in one DELETE if its version is one of `versions` (any
+    when None); casts cascade and the records they named get bumped. Returns
+    whether it was deleted. Not committed.
+    """
+    own, other, related = _cast_columns(model)
+    _lock_actors_first(model, record_id)
+    related_ids = select(func.array_agg(other)).where(own == model.id)
+    statement = (
+        delete(model)
+        .where(model.id == record_id)
+        .returning(model.id, related_ids.scalar_subquery())
+    )
+    if versions is not None:
+        statement = statement.where(model.version.in_(versions))
+    row = db.session.execute(statement).first()
+    if row is None:
+        return False
+    _touch_table(model, record_id)
+    if row[1]:
+        _bump_versions(related, row[1])
+    return True
+
+
+def _insert_cast(movie_id: int, actor_id: int):
+    """
+    Casts the actor in the movie in one INSERT ... ON CONFLICT DO NOTHING whose
+    CTEs lock the actor, then the movie. Returns "created", "exists" or
+    "missing". Commits when created.
+    """
+    actor = (
+        select(Actor.id)
+        .where(Actor.id == actor_id)
+        .with_for_update(key_share=True)
+        .cte("actor")
+    )
+    # Scanned only after the actor is locked
+    movie = (
+        select(Movie.id)
+        .where(Movie.id == movie_id, exists(actor.select()))
+        .with_for_update(key_share=True)
+        .cte("movie")
+    )
+    inserted = (
+        insert(Cast)
+        .from_select(
+            ["movie_id", "actor_id"],
+            select(movie.c.id, actor.c.id).select_from(movie.join(actor, true())),
+        )
+        .on_conflict_do_nothing()
+        .returning(Cast.movie_id)
+        .cte("inserted")
+    )
+    found, created = db.session.execute(
+        select(
+            select(func.count()).select_from(movie).scalar_subquery(),
+            select(func.count()).select_from(inserted).scalar_subquery(),
+        )
+    ).one()
+    if not created:
+        db.session.rollback()
+        return "exists" if found else "missing"
+    _bump_versions(Actor, [actor_id])
+    _bump_versions(Movie, [movie_id])
+    db.session.commit()
+    return "created"
+
+
+def _replace_casts(model: type[Movie | Actor], record_id: int, related_ids: set[int]):
+    """
+    Replaces the record's cast list with `related_ids` in one DELETE and one
+    INSERT, committed. Returns sorted (added, removed) ids, or None if the
+    record or any of `related_ids` doesn't exist.
+    """
+    own, other, related = _cast_columns(model)
+    current = select(other).where(own == record_id)
+    cast_ids = set(db.session.execute(current).scalars())
+    while True:
+        locked = _lock_records(
+            {model: [record_id], related: sorted(related_ids | cast_ids)}
+        )
+        if not locked[model] or not related_ids <= set(locked[related]):
+            db.session.rollback()
+            return None
+        # Casts are added with both records locked, so this read is final;
+        # casts added since the first one are locked on another pass
+        cast_ids = set(db.session.execute(current).scalars())
+        if cast_ids <= set(locked[related]):
+            break
+        db.session.rollback()
+
+    removed = (
+        db.session.execute(
+            delete(Cast)
+            .where(own == record_id, other.not_in(related_ids))
+            .returning(other)
+        )
+        .scalars()
+        .all()
+    )
+    added = []
+    if related_ids:
+        added = (
+            db.session.execute(
+                insert(Cast)
+                .values([{own.key: record_id, other.key: id} for id in related_ids])
+                .on_conflict_do_nothing()
+                .returning(other)
+            )
+            .scalars()
+            .all()
+        )
+    if added or removed:
+        _bump_versions(model, [record_id])
+        _bump_versions(related, [*added, *removed])
+    db.session.commit()
+    return sorted(added), sorted(removed)
+
+
+def _insert_many(model: type[Movie | Actor], rows: list[dict]):
+    """
+    Inserts `rows` (attribute name -> value) with multi-row INSERT ... RETURNING
+    and commits. Returns the new ids in order.
+    """
+    # Core rather than ORM bulk insert, which splits rows by their None values
+    table = model.__table__
+    ids = db.session.scalars(
+        insert(table).returning(table.c.id, sort_by_parameter_order=True), rows
+    ).all()
+    _touch_table(model)
+    db.session.commit()
+    return ids
+
+
+def _touch_table(model: type[Movie | Actor], *ids: int):
+    # Bumps the table's counter at commit and drops the cached lists and `ids`
+    db.session.info.setdefault("touched_tables", set()).add(model.__tablename__)
+    db.session.info.setdefault("invalidated_tags", set()).update(
+        [_cache_tag(model), *(_cache_tag(model, id) for id in ids)]
+    )
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_table_versions(session: Session):
+    # Once per table, in name order, so counters are always locked in one order
+    for name in sorted(session.info.pop("touched_tables", ())):
+        statement = insert(TableVersion).values(name=name, version=1)
+        session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[TableVersion.name],
+                set_={"version": TableVersion.version + 1},
+            )
+        )
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_touched_tables(session: Session):
+    session.info.pop("touched_tables", None)
+
+
+def _cache_tag(model: type[Movie | Actor], record_id: int | None = None):
+    # "actors" covers every list of actors, "actors:<id>" one actor's detail
+    if record_id is None:
+        return model.__tablename__
+    return f"{model.__tablename__}:{record_id}"
@@ -1,104 +1,217 @@
 from datetime import date, datetime
 from typing import Optional
 from flask import Flask, abort, make_response, request, jsonify
-from models import Genre, Movie
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from models import Cast, Genre, Movie, _replace_casts
 from utilities.utilities import (
+    InternalColumnPatch,
     _abort_if_falsy_and_not_none,
-    _camel_case_dict,
     _convert_json_patch_request_to_dict,
     _create_etag,
+    _sparse_fieldset,
 )
+from utilities.serializers import _serializer
+from utilities.pagination import (
+    _count_mode,
+    _keyset_page,
+    _offset_page,
+    _page_size,
+    _total,
+)
+from utilities.conditional import (
+    _apply_delete,
+    _apply_patch,
+    _cacheable,
+    _collection_etag,
+    _collection_not_modified,
+    _not_modified,
+)
+from utilities.batch import _batch_create, _id_set
+from utilities.cache import _cached_response
+from utilities.export import _ndjson_export
+from utilities.fragments import _encoded_records, _fragments_enabled
+from utilities.sql_json import _json_array, _json_body, _json_record, _render_mode
+from utilities.search import _apply_search_filter, _order_by_search_rank, _suggest
 from auth.validator import requires_auth
 
 MOVIES_PER_PAGE = 10
 
 
+def _movie_values(body):
+    # Column values for a new movie from a request body; raises ValueError
+    if not isinstance(body, dict):
+        raise ValueError("expected an object")
+    title = body.get("title")
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError("title must be a non-empty string")
+    genre = body.get("genre")
+    if genre not in (genre.value for genre in Genre):
+        raise ValueError("invalid genre")
+    release_date: str | None = body.get("releaseDate")
+    if release_date is not None and not isinstance(release_date, str):
+        raise ValueError("releaseDate must be a string")
+    poster_url = body.get("posterUrl")
+    if poster_url is not None and not isinstance(poster_url, str):
+        raise ValueError("posterUrl must be a string")
+
+    parsed_date: Optional[date] = None
+    if release_date and release_date.strip():
+        try:
+            parsed_date = datetime.strptime(release_date.strip(), "%Y-%m-%d").date()
+        except ValueError:
+            raise ValueError("releaseDate must be YYYY-MM-DD")
+
+    return {
+        "title": title.strip(),
+        "genre": Genre[genre],
+        "release_date": parsed_date,
+        "poster_url": poster_url,
+    }
+
+
 def movies_controller(app: Flask):
     @app.route("/movies", methods=["GET"])
     @requires_auth("read:movies")
+    @_cached_response(Movie)
     def get_movies():
-        page = request.args.get("page", 1, type=int)
+        page = max(request.args.get("page", 1, type=int), 1)
+        cursor = request.args.get("cursor", None, type=str)
         filter_by = request.args.get("search", "", type=str)
-        search_term = f"%{filter_by}%"
-        start = (page - 1) * MOVIES_PER_PAGE
-        end = start + MOVIES_PER_PAGE
-        count = Movie.query.filter(Movie.title.ilike(search_term)).count()
-        movies = (
-            Movie.query.filter(Movie.title.ilike(search_term))
-            .order_by(Movie.title)
-            .slice(start, end)
-            .all()
-        )
+        per_page = _page_size(MOVIES_PER_PAGE)
+        try:
+            count_mode = _count_mode()
+            render_mode = _render_mode()
+            columns, include_actors = _sparse_fieldset(Movie, "actors")
+        except ValueError:
+            abort(400)
+        etag = _collection_etag(Movie)
+        not_modified = _collection_not_modified(etag)
+        if not_modified is not None:
+            return not_modified
+        relation = "actors" if include_actors else None
+        fragments = render_mode == "orm" and _fragments_enabled(columns)
+        query = Movie.query
+        if render_mode == "db":
+            query = query.with_entities(
+                _json_record(Movie, columns, relation), Movie.title, Movie.id
+            )
+        elif columns is not None:
+            loaded = [getattr(Movie, column) for column in {*columns, "title"}]
+            query = query.options(load_only(*loaded))
+        if render_mode == "orm" and include_actors and not fragments:
+            query = query.options(selectinload(Movie.actors))
+        query = _apply_search_filter(query, Movie.title, filter_by)
 
-        payload = _camel_case_dict(
-            {
-                "success": True,
-                "movies": [movie.format() for movie in movies],
-                "total_movies": count,
-                "offset": start,
-            }
+        if cursor is not None:
+            try:
+                movies, next_cursor = _keyset_page(
+                    query, [Movie.title, Movie.id], cursor, per_page
+                )
+            except ValueError:
+                abort(400)
+            total = _total(query, count_mode)
+            has_more = next_cursor is not None
+            payload = {"success": True, "nextCursor": next_cursor}
+        else:
+            start = (page - 1) * per_page
+            movies, total, has_more = _offset_page(
+                _order_by_search_rank(query, Movie.title, filter_by, Movie.id),
+                start,
+                per_page,
+                count_mode,
+            )
+            payload = {"success": True, "offset": start}
+
+        if total is None:
+            payload["hasMore"] = has_more
+        else:
+            payload["totalMovies"] = total
+        if render_mode == "db":
+            body = _json_body(payload, {"movies": _json_array(movies)})
+            response = app.response_class(body, mimetype="application/json")
+            return _cacheable(response, etag), 200
+        if fragments:
+            encoded = _json_array(_encoded_records(Movie, movies, relation))
+            body = _json_body(payload, {"movies": encoded})
+            response = app.response_class(body, mimetype="application/json")
+            return _cacheable(response, etag), 200
+        serialize = _serializer(Movie, columns, relation)
+        payload["movies"] = [serialize(movie) for movie in movies]
+        return (
+            _cacheable(jsonify(payload), etag),
+            200,
         )
 
+    @app.route("/movies/export", methods=["GET"])
+    @requires_auth("read:movies")
+    def export_movies():
+        try:
+            return _ndjson_export(Movie, Movie.updated_at, [Movie.id])
+        except ValueError:
+            abort(400)
+
+    @app.route("/movies/suggest", methods=["GET"])
+    @requires_auth("read:movies")
+    @_cached_response(Movie)
+    def suggest_movies():
+        filter_by = request.args.get("search", "", type=str).strip()
+        if not filter_by:
+            return jsonify({"success": True, "suggestions": []}), 200
+        rows = _suggest(
+            Movie.title, Cast.movie_id, filter_by, _page_size(MOVIES_PER_PAGE)
+        )
         return (
-            jsonify(payload),
+            jsonify(
+                {
+                    "success": True,
+                    "suggestions": [{"id": row[0], "label": row[1]} for row in rows],
+                }
+            ),
             200,
         )
 
     @app.route("/movies", methods=["POST"])
     @requires_auth("create:movies")
     def post_movie():
-        body = request.get_json()
-        if not (
-            isinstance(body.get("title"), str)
-            and body.get("title")
-            and body.get("genre") in (genre.value for genre in Genre)
-            and (
-                body.get("releaseDate") is None
-                or isinstance(body.get("releaseDate"), str)
-            )
-            and (
-                body.get("posterUrl") is None or isinstance(body.get("posterUrl"), str)
-            )
-        ):
+        try:
+            values = _movie_values(request.get_json())
+        except ValueError:
             abort(400)
 
-        title: str = body.get("title")
-        title = title.strip()
-        genre: str = body.get("genre")
-        genre = genre.strip()
-        release_date: str | None = body.get("releaseDate", None)
-        if release_date:
-            release_date = release_date.strip()
-        parsed_date: Optional[date] = None
-        if release_date:
-            try:
-                parsed_date = datetime.strptime(release_date, "%Y-%m-%d").date()
-            except Exception:
-                abort(400)
-
-        movie = Movie(
-            title=title,
-            genre=(Genre[genre]),
-            release_date=(parsed_date if parsed_date else None),
-            poster_url=body.get("posterUrl", None),
-        )
+        movie = Movie(**values)
 
         movie.add()
 
         return jsonify({"success": True, "id": movie.id}), 201
 
+    @app.route("/movies:batch", methods=["POST"])
+    @requires_auth("create:movies")
+    def post_movies_batch():
+        return _batch_create(Movie, _movie_values)
+
     @app.route("/movies/<int:movie_id>", methods=["GET"])
     @requires_auth("read:movies")
+    @_cached_response(Movie)
     def get_movie(movie_id: int):
         if not isinstance(movie_id, int):
             abort(400)
-        movie = Movie.query.get_or_404(movie_id)
+        not_modified = _not_modified(Movie, movie_id)
+        if not_modified is not None:
+            return not_modified
+        if _fragments_enabled(None):
+            movie = Movie.query.get_or_404(movie_id)
+            encoded = _encoded_records(Movie, [movie], "actors")[0]
+            body = _json_body({"success": True}, {"movie": encoded})
+            response = app.response_class(body, mimetype="application/json")
+            response.set_etag(_create_etag(movie))
+            return response
+        movie = Movie.query.options(joinedload(Movie.actors)).get_or_404(movie_id)
         etag = _create_etag(movie)
 
-        payload = _camel_case_dict({"success": True, "movie": movie.format()})
+        payload = {"success": True, "movie": _serializer(Movie, None, "actors")(movie)}
 
         response = make_response(jsonify(payload), 200)
-        response.headers["ETag"] = etag
+        response.set_etag(etag)
         return response
 
     # JSON Patch https://datatracker.ietf.org/doc/html/rfc6902
@@ -122,26 +235,25 @@ def movies_controller(app: Flask):
 
         try:
             data = _convert_json_patch_request_to_dict(body, Movie)
+        except InternalColumnPatch:
+            abort(422)
         except TypeError:
             abort(400)
         except ValueError:
             abort(400)
 
-        movie = Movie.query.get_or_404(movie_id)
-
-        orig_hash = _create_etag(movie)
-
+        values = {}
         for key in data:
             if key == "title":
                 if not data["title"] or not isinstance(data["title"], str):
                     abort(400)
                 else:
-                    movie.title = data["title"].strip()
+                    values["title"] = data["title"].strip()
             if key == "genre":
                 if not data["genre"]:
                     abort(400)
                 try:
-                    movie.genre = Genre[data["genre"].strip()]
+                    values["genre"] = Genre[data["genre"].strip()]
                 except Exception:
                     abort(400)
             if key == "release_date":
@@ -150,7 +262,7 @@ def movies_controller(app: Flask):
                 ) or _abort_if_falsy_and_not_none(data["release_date"]):
                     abort(400)
                 try:
-                    movie.release_date = (
+                    values["release_date"] = (
                         datetime.strptime(
                             data["release_date"].strip(), "%Y-%m-%d"
                         ).date()
@@ -164,31 +276,29 @@ def movies_controller(app: Flask):
                     data["poster_url"] and not isinstance(data["poster_url"], str)
                 ) or _abort_if_falsy_and_not_none(data["poster_url"]):
                     abort(400)
-                movie.poster_url = (
+                values["poster_url"] = (
                     data["poster_url"].strip() if data["poster_url"] else None
                 )
 
-        new_hash = _create_etag(movie)
+        return _apply_patch(Movie, movie_id, values)
 
-        if new_hash == orig_hash:
-            response = make_response(jsonify(), 204)
-            response.headers["ETag"] = orig_hash
-            return response
-        else:
-            movie.update()  # Only update if content changed
-            response = make_response(jsonify({"success": True, "id": movie.id}), 200)
-            response.headers["ETag"] = new_hash
-            return response
+    @app.route("/movies/<int:movie_id>/actors", methods=["PUT"])
+    @requires_auth("create:casts", "delete:casts")
+    def put_movie_actors(movie_id: int):
+        try:
+            actor_ids = _id_set(request.get_json(), "actorIds")
+        except ValueError:
+            abort(400)
+        changes = _replace_casts(Movie, movie_id, actor_ids)
+        if changes is None:
+            abort(404)
+        added, removed = changes
+        payload = {"success": True, "id": movie_id, "added": added, "removed": removed}
+        return jsonify(payload), 200
 
     @app.route("/movies/<int:movie_id>", methods=["DELETE"])
     @requires_auth("delete:movies")
     def delete_movie(movie_id: int):
         if not isinstance(movie_id, int):
             abort(400)
-        movie = Movie.query.get_or_404(movie_id)
-        movie_id = movie.id
-        movie.delete()
-
-        payload = _camel_case_dict({"success": True, "id": movie_id})
-        response = make_response(jsonify(payload), 200)
-        return response
+        return _apply_delete(Movie, movie_id)
@@ -25,8 +25,15 @@ def mock_decorator_function(*args, **kwargs):
 patch("auth.validator.requires_auth", mock_decorator_function).start()
 
 from app import create_app
-from models import Cast, db, Actor
+from models import Cast, db, Actor, Movie
 from utilities.hydrate_db import make_movies, make_actors
+from tests import captured_statements
+from utilities.pagination import _encode_cursor
+from utilities.search import _trigram_support
+from utilities.json_provider import OrjsonProvider, StdlibJSONProvider
+from utilities.cache import MemoryBackend, ResponseCache
+from utilities.serializers import _serializer
+from utilities.utilities import _camel_case_dict
 from dotenv import load_dotenv
 import json
 
@@ -115,6 +122,305 @@ class ActorTestCase(unittest.TestCase):
             [8, 15, 17, 13, 18, 2, 4, 7, 1],
         )
 
+    def test_get_actors_cursor_pagination(self):
+        res = self.client.get("/actors?page=1&limit=20")
+        all_ids = [actor["id"] for actor in json.loads(res.data)["actors"]]
+
+        seen = []
+        cursor = ""
+        while cursor is not None:
+            res = self.client.get(f"/actors?cursor={cursor}&limit=7")
+            data = json.loads(res.data)
+
+            self.assertEqual(res.status_code, 200)
+            self.assertLessEqual(len(data["actors"]), 7)
+            seen.extend(actor["id"] for actor in data["actors"])
+            cursor = data["nextCursor"]
+
+        self.assertEqual(seen, all_ids)
+        self.assertEqual(len(seen), 19)
+
+    def test_get_actors_cursor_stable_under_inserts(self):
+        res = self.client.get("/actors?cursor=&limit=5")
+        data = json.loads(res.data)
+        first_page = [actor["name"] for actor in data["actors"]]
+
+        # A row sorting before the cursor must not shift the next page
+        with self.app.app_context():
+            Actor(name="Aaron Aardvark", age=30, photo_url=None, gender=None).add()
+
+        res = self.client.get(f"/actors?cursor={data['nextCursor']}&limit=5")
+        second_page = [actor["name"] for actor in json.loads(res.data)["actors"]]
+
+        self.assertNotIn("Aaron Aardvark", second_page)
+        self.assertGreater(second_page[0], first_page[-1])
+
+    def test_get_actors_limit_is_capped(self):
+        res = self.client.get("/actors?limit=100000")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(data["actors"]), 19)
+
+    def test_get_actors_invalid_cursor_400(self):
+        res = self.client.get("/actors?cursor=not-a-cursor")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data, {"success": False, "error": "Bad Request"})
+
+    def test_get_actors_malformed_cursor_400(self):
+        for values in (
+            ["Tom Hanks", True],
+            ["Tom Hanks", 1.5],
+            ["Tom Hanks", 2**31],
+            ["Tom\u0000Hanks", 1],
+            [None, 1],
+        ):
+            cursor = _encode_cursor(values)
+            res = self.client.get(f"/actors?cursor={cursor}")
+            data = json.loads(res.data)
+
+            self.assertEqual(res.status_code, 400, values)
+            self.assertEqual(data, {"success": False, "error": "Bad Request"})
+
+    def test_get_actors_count_exact_past_last_page(self):
+        res = self.client.get("/actors?page=5&count=exact")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data["actors"], [])
+        self.assertEqual(data["totalActors"], 19)
+
+    def test_get_actors_count_none(self):
+        res = self.client.get("/actors?count=none")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(list(data.keys()), ["actors", "hasMore", "offset", "success"])
+        self.assertEqual(len(data["actors"]), 10)
+        self.assertTrue(data["hasMore"])
+
+        res = self.client.get("/actors?count=none&page=2")
+        data = json.loads(res.data)
+
+        self.assertEqual(len(data["actors"]), 9)
+        self.assertFalse(data["hasMore"])
+
+    def test_get_actors_count_estimated(self):
+        res = self.client.get("/actors?count=estimated")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        # Never analyzed, so this falls back to an exact count
+        self.assertEqual(data["totalActors"], 19)
+
+        with self.engine.begin() as connection:
+            connection.execute(text("ANALYZE actors"))
+
+        res = self.client.get("/actors?count=estimated&search=tom")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIsInstance(data["totalActors"], int)
+        self.assertEqual(len(data["actors"]), 2)
+
+    def test_get_actors_invalid_count_mode_400(self):
+        res = self.client.get("/actors?count=lots")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data, {"success": False, "error": "Bad Request"})
+
+    def test_get_actors_query_count_independent_of_page_contents(self):
+        with captured_statements(self.app) as statements:
+            res = self.client.get("/actors")
+        bare_queries = len(statements)
+        self.assertEqual(res.status_code, 200)
+
+        with self.app.app_context():
+            db.session.add_all(
+                [
+                    Cast(movie_id=movie_id, actor_id=actor_id)
+                    for movie_id in range(1, 12)
+                    for actor_id in range(1, 20)
+                ]
+            )
+            db.session.commit()
+
+        with captured_statements(self.app) as statements:
+            res = self.client.get("/actors")
+        cast_queries = len(statements)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(all(len(actor["movies"]) == 11 for actor in data["actors"]))
+        # The collection version, the page (with its total) and one select-in
+        # load for every movie
+        self.assertEqual(bare_queries, 3)
+        self.assertEqual(cast_queries, 3)
+
+        titles = [movie["title"] for movie in data["actors"][0]["movies"]]
+        self.assertEqual(titles, sorted(titles))
+
+        with captured_statements(self.app) as statements:
+            res = self.client.get("/actors/1")
+        detail_queries = len(statements)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(json.loads(res.data)["actor"]["movies"]), 11)
+        self.assertEqual(detail_queries, 1)
+
+    def test_get_actors_sparse_fieldset(self):
+        with self.app.app_context():
+            Cast(movie_id=1, actor_id=1).add()
+
+        # Warm the once-per-process search capability probe
+        self.client.get("/actors?search=warm")
+        with captured_statements(self.app) as statements:
+            res = self.client.get("/actors?search=tom&fields=name&include=")
+        queries = len(statements)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            data["actors"],
+            [{"id": 7, "name": "Tom Cruise"}, {"id": 1, "name": "Tom Hanks"}],
+        )
+        # The collection version and the page, no select-in load for movies
+        self.assertEqual(queries, 2)
+
+    def test_get_actors_fields_with_include(self):
+        with self.app.app_context():
+            Cast(movie_id=1, actor_id=1).add()
+
+        res = self.client.get("/actors?search=hanks&fields=photoUrl,age&include=movies")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        actor = data["actors"][0]
+        self.assertEqual(list(actor.keys()), ["age", "id", "movies", "photoUrl"])
+        self.assertEqual([movie["id"] for movie in actor["movies"]], [1])
+
+        res = self.client.get("/actors?search=hanks&include=")
+        actor = json.loads(res.data)["actors"][0]
+        self.assertEqual(
+            list(actor.keys()), ["age", "gender", "id", "name", "photoUrl"]
+        )
+
+    def test_get_actors_unknown_field_or_include_400(self):
+        for url in ("/actors?fields=name,salary", "/actors?include=agents"):
+            res = self.client.get(url)
+            data = json.loads(res.data)
+
+            self.assertEqual(res.status_code, 400)
+            self.assertEqual(data, {"success": False, "error": "Bad Request"})
+
+    def test_serializers_match_format(self):
+        with self.app.app_context():
+            Actor(name="No Gender", age=30, photo_url=None, gender=None).add()
+            db.session.add_all(
+                [Cast(movie_id=movie_id, actor_id=1) for movie_id in (1, 4, 9)]
+            )
+            db.session.commit()
+
+            for record in Actor.query.all() + Movie.query.all():
+                relation = "movies" if isinstance(record, Actor) else "actors"
+                self.assertEqual(
+                    self.app.json.dumps(
+                        _serializer(type(record), None, relation)(record)
+                    ),
+                    self.app.json.dumps(_camel_case_dict(record.format())),
+                )
+
+    def test_json_providers_agree(self):
+        with self.app.app_context():
+            db.session.add(Cast(movie_id=1, actor_id=1))
+            db.session.commit()
+            payload = {
+                "success": True,
+                "actor": _serializer(Actor, None, "movies")(db.session.get(Actor, 1)),
+            }
+
+            stdlib = StdlibJSONProvider(self.app).response(payload).get_data()
+            fast = OrjsonProvider(self.app).response(payload).get_data()
+
+        self.assertEqual(stdlib, fast)
+        self.assertIn(b'"gender":"MALE"', fast)
+        self.assertIn(b'"releaseDate":"1995-06-30"', fast)
+        self.assertTrue(fast.endswith(b"}\n"))
+
+    def test_get_actors_render_db_matches_orm(self):
+        for params in (
+            "",
+            "&include=movies",
+            "&fields=name,age&include=movies",
+            "&count=none&search=to",
+            "&count=estimated",
+            "&cursor=",
+        ):
+            orm = self.client.get("/actors?limit=5" + params)
+            db_rendered = self.client.get("/actors?limit=5&render=db" + params)
+
+            self.assertEqual(db_rendered.status_code, 200)
+            self.assertEqual(db_rendered.mimetype, "application/json")
+            self.assertEqual(json.loads(db_rendered.data), json.loads(orm.data))
+
+    def test_get_actors_render_db_query_count(self):
+        self.client.get("/actors?search=warm-up")
+        with captured_statements(self.app) as statements:
+            res = self.client.get("/actors?limit=100&render=db&include=movies")
+        queries = len(statements)
+
+        self.assertEqual(res.status_code, 200)
+        # The collection version and the page, movies included
+        self.assertEqual(queries, 2)
+
+    def test_get_actors_invalid_render_mode_400(self):
+        res = self.client.get("/actors?render=xml")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(data["success"])
+
+    def test_get_actors_if_none_match_304(self):
+        res = self.client.get("/actors?page=2")
+        etag = res.get_etag()[0]
+
+        self.assertEqual(res.headers["Vary"], "Authorization")
+        self.assertIn("stale-while-revalidate", res.headers["Cache-Control"])
+
+        with captured_statements(self.app) as statements:
+            res = self.client.get(
+                "/actors?page=2", headers={"If-None-Match": f'"{etag}"'}
+            )
+        queries = len(statements)
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b"")
+        self.assertEqual(res.get_etag()[0], etag)
+        self.assertIn("stale-while-revalidate", res.headers["Cache-Control"])
+        self.assertEqual(queries, 1)
+
+        # Other parameters, other tag
+        res = self.client.get("/actors?page=3", headers={"If-None-Match": f'"{etag}"'})
+        self.assertEqual(res.status_code, 200)
+
+    def test_get_actors_etag_changes_with_any_record(self):
+        etag = self.client.get("/actors").get_etag()[0]
+
+        with self.app.app_context():
+            Cast(movie_id=1, actor_id=19).add()
+        etag2 = self.client.get("/actors").get_etag()[0]
+        self.assertNotEqual(etag2, etag)
+
+        # A movie title shows up in its actors' lists
+        self.client.patch(
+            "/movies/1",
+            json=[{"op": "add", "path": "/title", "value": "Apollo 14"}],
+            content_type="application/json-patch+json",
+        )
+        res = self.client.get("/actors", headers={"If-None-Match": f'"{etag2}"'})
+        self.assertEqual(res.status_code, 200)
+
     def test_get_actors_bad_query_param_type_200(self):
         # ignore improper query params and return a default of 1 for page
         res = self.client.get("/actors?page=sizzle")
@@ -153,6 +459,88 @@ class ActorTestCase(unittest.TestCase):
         self.assertEqual(data["totalActors"], 2)
         self.assertEqual(data["offset"], 0)
 
+    def _enable_trigram_search(self):
+        """
+        Installs what the search migration does, so searches take the pg_trgm
+        path. Without the extensions, plain SQL stand-ins for f_unaccent() and
+        similarity() still run the queries that path builds. Returns whether
+        the real extensions are installed.
+        """
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                connection.execute(text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+                connection.execute(
+                    text(
+                        "CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text "
+                        "LANGUAGE sql IMMUTABLE STRICT AS "
+                        "$$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$"
+                    )
+                )
+            extensions = True
+        except Exception:
+            with self.engine.begin() as connection:
+                connection.execute(
+                    text(
+                        "CREATE FUNCTION f_unaccent(text) RETURNS text "
+                        "LANGUAGE sql IMMUTABLE STRICT AS $$ SELECT $1 $$"
+                    )
+                )
+                connection.execute(
+                    text(
+                        "CREATE FUNCTION similarity(text, text) RETURNS real "
+                        "LANGUAGE sql IMMUTABLE STRICT AS $$ SELECT 0::real $$"
+                    )
+                )
+            extensions = False
+        cached = dict(_trigram_support)
+        _trigram_support.clear()
+
+        def cleanup():
+            with self.engine.begin() as connection:
+                connection.execute(text("DROP FUNCTION IF EXISTS f_unaccent(text)"))
+                if not extensions:
+                    connection.execute(
+                        text("DROP FUNCTION IF EXISTS similarity(text, text)")
+                    )
+            _trigram_support.clear()
+            _trigram_support.update(cached)
+
+        self.addCleanup(cleanup)
+        return extensions
+
+    def test_search_actors_trigram_accent_insensitive(self):
+        if not self._enable_trigram_search():
+            self.skipTest("pg_trgm/unaccent extensions are not available")
+
+        with self.app.app_context():
+            actor = Actor(name="Zoë Saldaña", age=47, photo_url=None, gender=None)
+            actor.add()
+
+        res = self.client.get("/actors?search=saldana")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([a["name"] for a in data["actors"]], ["Zoë Saldaña"])
+
+    def test_search_actors_wildcards_are_literal(self):
+        with self.app.app_context():
+            Actor(name="Lil_Tom", age=30, photo_url=None, gender=None).add()
+            Actor(name="Lil Tom", age=30, photo_url=None, gender=None).add()
+            Actor(name="100% Tom", age=30, photo_url=None, gender=None).add()
+
+        for trigram in (False, True):
+            if trigram:
+                self._enable_trigram_search()
+            for search, names in (
+                ("l_tom", ["Lil_Tom"]),
+                ("%", ["100% Tom"]),
+                ("0%25 t", ["100% Tom"]),
+            ):
+                res = self.client.get(f"/actors?search={search}&fields=name")
+                names_found = [a["name"] for a in json.loads(res.data)["actors"]]
+                self.assertEqual(names_found, names, (search, trigram))
+
     def test_search_actors_no_results(self):
         res = self.client.get("/actors?search=rUtAbAgA")
         data = json.loads(res.data)
@@ -166,6 +554,105 @@ class ActorTestCase(unittest.TestCase):
         self.assertEqual(data["totalActors"], 0)
         self.assertEqual(data["offset"], 0)
 
+    def test_suggest_actors(self):
+        with self.app.app_context():
+            Actor(name="Atom Ant", age=5, photo_url=None, gender=None).add()
+            Actor(name="Tommy Lee Jones", age=78, photo_url=None, gender=None).add()
+            new_id = Actor.query.filter(Actor.name == "Tommy Lee Jones").one().id
+            db.session.add_all(
+                [Cast(movie_id=1, actor_id=new_id), Cast(movie_id=2, actor_id=new_id)]
+            )
+            db.session.commit()
+
+        with captured_statements(self.app) as statements:
+            res = self.client.get("/actors/suggest?search=tom")
+        queries = len(statements)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(list(data.keys()), ["success", "suggestions"])
+        # Prefix matches first, most cast first, then the infix match
+        self.assertEqual(
+            data["suggestions"],
+            [
+                {"id": new_id, "label": "Tommy Lee Jones"},
+                {"id": 7, "label": "Tom Cruise"},
+                {"id": 1, "label": "Tom Hanks"},
+                {"id": new_id - 1, "label": "Atom Ant"},
+            ],
+        )
+        self.assertLessEqual(queries, 2)
+
+    def test_suggest_actors_wildcards_are_literal(self):
+        with self.app.app_context():
+            Actor(name="Lil_Tom", age=30, photo_url=None, gender=None).add()
+            Actor(name="Lil Tom", age=30, photo_url=None, gender=None).add()
+
+            Actor(name="100% Tom", age=30, photo_url=None, gender=None).add()
+
+        for trigram in (False, True):
+            if trigram:
+                self._enable_trigram_search()
+            # "_" and "%" match only themselves, in the infix phase as in the prefix one
+            for search, labels in (
+                ("l_tom", ["Lil_Tom"]),
+                ("lil_", ["Lil_Tom"]),
+                ("%", ["100% Tom"]),
+                ("100%25", ["100% Tom"]),
+            ):
+                res = self.client.get(f"/actors/suggest?search={search}")
+                data = json.loads(res.data)
+                self.assertEqual(
+                    [suggestion["label"] for suggestion in data["suggestions"]],
+                    labels,
+                    (search, trigram),
+                )
+
+    def test_suggest_actors_empty_search(self):
+        with captured_statements(self.app) as statements:
+            res = self.client.get("/actors/suggest?search=%20")
+        queries = len(statements)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data, {"success": True, "suggestions": []})
+        self.assertEqual(queries, 0)
+
+    def test_export_actors(self):
+        res = self.client.get("/actors/export")
+        lines = res.get_data(as_text=True).splitlines()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, "application/x-ndjson")
+        with self.app.app_context():
+            self.assertEqual(len(lines), Actor.query.count())
+            first = Actor.query.order_by(Actor.id).first()
+            self.assertEqual(
+                json.loads(lines[0]),
+                json.loads(self.app.json.dumps(_serializer(Actor)(first))),
+            )
+        self.assertNotIn("updatedAt", json.loads(lines[0]))
+
+    def test_export_actors_since(self):
+        with self.app.app_context():
+            db.session.execute(
+                text("UPDATE actors SET updated_at = '2020-01-01' WHERE id <> 3")
+            )
+            db.session.commit()
+
+        res = self.client.get("/actors/export?since=2024-06-01T00:00:00%2B00:00")
+        lines = res.get_data(as_text=True).splitlines()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([json.loads(line)["id"] for line in lines], [3])
+
+    def test_export_actors_invalid_since_400(self):
+        res = self.client.get("/actors/export?since=yesterday")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(data["success"])
+
     def test_create_actor(self):
         new_actor = {
             "age": 4,
@@ -254,6 +741,69 @@ class ActorTestCase(unittest.TestCase):
         self.assertFalse(data["success"])
         self.assertEqual(data["error"], "Unsupported Media Type")
 
+    def test_create_actors_batch(self):
+        new_actors = [
+            {"age": 40, "gender": "FEMALE", "name": " Ana Gasteyer "},
+            {"age": 0, "name": "Too Young"},
+            {"age": 62, "name": "Dana Carvey", "photoUrl": "https://example.com/d.jpg"},
+            "not an actor",
+        ]
+        with captured_statements(self.app) as statements:
+            res = self.client.post("/actors:batch", json=new_actors)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 201)
+        self.assertFalse(data["success"])
+        self.assertEqual([id is None for id in data["ids"]], [False, True, False, True])
+        self.assertEqual([error["index"] for error in data["errors"]], [1, 3])
+        # Both valid actors in a single INSERT
+        self.assertEqual(
+            len([s for s in statements if s.startswith("INSERT INTO actors")]), 1
+        )
+        with self.app.app_context():
+            created = db.session.get(Actor, data["ids"][0])
+            self.assertEqual(created.name, "Ana Gasteyer")
+            self.assertEqual(created.gender.value, "FEMALE")
+            self.assertEqual(db.session.get(Actor, data["ids"][2]).name, "Dana Carvey")
+
+    def test_create_actors_batch_atomic(self):
+        new_actors = [{"age": 40, "name": "Ana Gasteyer"}, {"age": 0, "name": "X"}]
+        with self.app.app_context():
+            count = Actor.query.count()
+
+        res = self.client.post("/actors:batch?mode=atomic", json=new_actors)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(data["ids"], [None, None])
+        self.assertEqual(data["errors"][0]["index"], 1)
+        with self.app.app_context():
+            self.assertEqual(Actor.query.count(), count)
+
+        res = self.client.post("/actors:batch?mode=atomic", json=new_actors[:1])
+        self.assertEqual(res.status_code, 201)
+        self.assertTrue(json.loads(res.data)["success"])
+
+    def test_create_actors_batch_invalidates_lists(self):
+        etag = self.client.get("/actors").headers["ETag"]
+
+        self.client.post("/actors:batch", json=[{"age": 40, "name": "Aaron A"}])
+        res = self.client.get("/actors", headers={"If-None-Match": etag})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(json.loads(res.data)["actors"][0]["name"], "Aaron A")
+
+    def test_create_actors_batch_400(self):
+        for body, url in (
+            ({"age": 40, "name": "Not a list"}, "/actors:batch"),
+            ([], "/actors:batch"),
+            ([{"age": 40, "name": "A"}] * 1001, "/actors:batch"),
+            ([{"age": 40, "name": "A"}], "/actors:batch?mode=sometimes"),
+        ):
+            res = self.client.post(url, json=body)
+            self.assertEqual(res.status_code, 400)
+            self.assertFalse(json.loads(res.data)["success"])
+
     def test_patch_actors_405(self):
         # Fails, since PATCH is not allowed on the actors endpoint
         new_actor = {
@@ -317,6 +867,65 @@ class ActorTestCase(unittest.TestCase):
             },
         )
 
+    def test_get_actor_etag_follows_version(self):
+        etag = self.client.get("/actors/1").get_etag()[0]
+        self.assertEqual(self.client.get("/actors/1").get_etag()[0], etag)
+
+        # Cast changes alter the actor's movies, so the tag moves
+        with self.app.app_context():
+            Cast(movie_id=1, actor_id=1).add()
+        etag2 = self.client.get("/actors/1").get_etag()[0]
+        self.assertNotEqual(etag2, etag)
+
+        # A movie's ETag covers its actors too
+        with self.app.app_context():
+            movie_version = db.session.get(Movie, 1).version
+        self.client.patch(
+            "/actors/1",
+            json=[{"op": "add", "path": "/name", "value": "Thomas Hanks"}],
+            content_type="application/json-patch+json",
+        )
+        with self.app.app_context():
+            self.assertEqual(db.session.get(Movie, 1).version, movie_version + 1)
+        self.assertNotEqual(self.client.get("/actors/1").get_etag()[0], etag2)
+
+    def test_get_actor_if_none_match_304(self):
+        etag = self.client.get("/actors/1").get_etag()[0]
+
+        with captured_statements(self.app) as statements:
+            res = self.client.get("/actors/1", headers={"If-None-Match": f'"{etag}"'})
+        queries = len(statements)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b"")
+        self.assertEqual(res.get_etag()[0], etag)
+        # Only the version lookup, no actor or movie rows
+        self.assertEqual(queries, 1)
+
+    def test_get_actor_if_none_match_weak_and_list(self):
+        etag = self.client.get("/actors/1").get_etag()[0]
+
+        for header in (f'W/"{etag}"', f'"1-0", "{etag}"', "*"):
+            res = self.client.get("/actors/1", headers={"If-None-Match": header})
+            self.assertEqual(res.status_code, 304, header)
+
+    def test_get_actor_if_none_match_stale_200(self):
+        etag = self.client.get("/actors/1").get_etag()[0]
+        with self.app.app_context():
+            Cast(movie_id=1, actor_id=1).add()
+
+        res = self.client.get("/actors/1", headers={"If-None-Match": f'"{etag}"'})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.get_etag()[0], etag)
+        self.assertEqual(len(data["actor"]["movies"]), 1)
+
+    def test_get_actor_if_none_match_404(self):
+        res = self.client.get("/actors/100000", headers={"If-None-Match": '"1-1"'})
+
+        self.assertEqual(res.status_code, 404)
+
     def test_get_actor_404(self):
         res = self.client.get("/actors/99")
         data = json.loads(res.data)
@@ -509,6 +1118,27 @@ class ActorTestCase(unittest.TestCase):
             actor_or_none = Actor.query.filter(Actor.id == 2).one_or_none()
             self.assertEqual(actor_or_none, None)
 
+    def test_delete_actor_cascades_in_one_statement(self):
+        with self.app.app_context():
+            for movie_id in (1, 2):
+                Cast(movie_id=movie_id, actor_id=1).add()
+            movie_versions = [db.session.get(Movie, i).version for i in (1, 2)]
+        with captured_statements(self.app) as statements:
+            res = self.client.delete("/actors/1")
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(json.loads(res.data), {"success": True, "id": 1})
+        # Nothing is loaded first and the casts go by ON DELETE CASCADE
+        self.assertTrue(statements[0].startswith("DELETE FROM actors"))
+        self.assertFalse(any(s.startswith("DELETE FROM casts") for s in statements))
+        self.assertFalse(any(s.startswith("SELECT") for s in statements))
+        with self.app.app_context():
+            self.assertEqual(Cast.query.filter(Cast.actor_id == 1).count(), 0)
+            self.assertEqual(
+                [db.session.get(Movie, i).version for i in (1, 2)],
+                [version + 1 for version in movie_versions],
+            )
+
     def test_delete_actor_error(self):
         res = self.client.delete("/actors/200")
         data = json.loads(res.data)
@@ -517,6 +1147,310 @@ class ActorTestCase(unittest.TestCase):
         self.assertFalse(data["success"])
         self.assertEqual(data["error"], "Not Found")
 
+    def test_patch_actor_if_match(self):
+        etag = self.client.get("/actors/1").get_etag()[0]
+        patch_request = [{"op": "add", "path": "/age", "value": 70}]
+        with captured_statements(self.app) as statements:
+            res = self.client.patch(
+                "/actors/1",
+                json=patch_request,
+                content_type="application/json-patch+json",
+                headers={"If-Match": f'"{etag}"'},
+            )
+        etag2 = res.get_etag()[0]
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(etag2, etag)
+        # No read of the actor before writing
+        self.assertTrue(statements[0].startswith("UPDATE actors"))
+        self.assertFalse(any(s.startswith("SELECT") for s in statements))
+
+        # Someone else's tag is now stale
+        res = self.client.patch(
+            "/actors/1",
+            json=[{"op": "add", "path": "/age", "value": 71}],
+            content_type="application/json-patch+json",
+            headers={"If-Match": f'"{etag}"'},
+        )
+        self.assertEqual(res.status_code, 412)
+        self.assertEqual(json.loads(res.data)["error"], "Precondition Failed")
+
+        # Nothing to change
+        res = self.client.patch(
+            "/actors/1",
+            json=patch_request,
+            content_type="application/json-patch+json",
+            headers={"If-Match": f'"{etag2}"'},
+        )
+        self.assertEqual(res.status_code, 204)
+        self.assertEqual(res.get_etag()[0], etag2)
+
+        res = self.client.get("/actors/1")
+        self.assertEqual(json.loads(res.data)["actor"]["age"], 70)
+        self.assertEqual(res.get_etag()[0], etag2)
+
+    def test_patch_actor_writes_only_patched_columns(self):
+        with self.app.app_context():
+            Cast(movie_id=1, actor_id=1).add()
+            movie_version = db.session.get(Movie, 1).version
+        etag = self.client.get("/actors/1").get_etag()[0]
+        patch_request = [{"op": "add", "path": "/age", "value": 70}]
+        with captured_statements(self.app) as statements:
+            res = self.client.patch(
+                "/actors/1",
+                json=patch_request,
+                content_type="application/json-patch+json",
+            )
+            changed = list(statements)
+            statements.clear()
+            unchanged = self.client.patch(
+                "/actors/1",
+                json=patch_request,
+                content_type="application/json-patch+json",
+            )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.get_etag()[0], etag)
+        # One UPDATE of the patched column; the actor and its movies aren't loaded
+        set_clause = changed[0].partition(" WHERE ")[0]
+        self.assertTrue(set_clause.startswith("UPDATE actors SET "))
+        self.assertIn("age=", set_clause)
+        self.assertNotIn("name=", set_clause)
+        self.assertFalse(any(s.startswith("SELECT") for s in changed))
+        with self.app.app_context():
+            self.assertEqual(db.session.get(Movie, 1).version, movie_version + 1)
+
+        # Same value again: the UPDATE matches no row, then the version is read for
+        # the 204's ETag
+        self.assertEqual(unchanged.status_code, 204)
+        self.assertEqual(unchanged.get_etag()[0], res.get_etag()[0])
+        self.assertEqual([s.split()[0] for s in statements], ["UPDATE", "SELECT"])
+
+    def test_patch_actor_if_match_weak_or_missing(self):
+        etag = self.client.get("/actors/1").get_etag()[0]
+        patch_request = [{"op": "add", "path": "/age", "value": 70}]
+
+        res = self.client.patch(
+            "/actors/1",
+            json=patch_request,
+            content_type="application/json-patch+json",
+            headers={"If-Match": f'W/"{etag}"'},
+        )
+        self.assertEqual(res.status_code, 412)
+
+        res = self.client.patch(
+            "/actors/1000",
+            json=patch_request,
+            content_type="application/json-patch+json",
+            headers={"If-Match": "*"},
+        )
+        # If-Match never matches a record that doesn't exist, not even "*"
+        self.assertEqual(res.status_code, 412)
+        res = self.client.delete("/actors/1000", headers={"If-Match": "*"})
+        self.assertEqual(res.status_code, 412)
+        res = self.client.delete("/actors/1000")
+        self.assertEqual(res.status_code, 404)
+
+    def test_patch_actor_internal_column_422(self):
+        for path, value in (("/version", 99), ("/updatedAt", "2000-01-01")):
+            res = self.client.patch(
+                "/actors/1",
+                json=[{"op": "add", "path": path, "value": value}],
+                content_type="application/json-patch+json",
+            )
+            data = json.loads(res.data)
+
+            self.assertEqual(res.status_code, 422)
+            self.assertEqual(data, {"success": False, "error": "Unprocessable Content"})
+        with self.app.app_context():
+            self.assertEqual(db.session.get(Actor, 1).version, 1)
+
+    def test_delete_actor_if_match(self):
+        with self.app.app_context():
+            Cast(movie_id=1, actor_id=1).add()
+            movie_version = db.session.get(Movie, 1).version
+        etag = self.client.get("/actors/1").get_etag()[0]
+
+        res = self.client.delete("/actors/1", headers={"If-Match": '"1-0"'})
+        self.assertEqual(res.status_code, 412)
+        with self.app.app_context():
+            self.assertEqual(Cast.query.filter(Cast.actor_id == 1).count(), 1)
+
+        res = self.client.delete("/actors/1", headers={"If-Match": f'"{etag}"'})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data, {"success": True, "id": 1})
+        with self.app.app_context():
+            self.assertIsNone(db.session.get(Actor, 1))
+            self.assertEqual(Cast.query.filter(Cast.actor_id == 1).count(), 0)
+            self.assertEqual(db.session.get(Movie, 1).version, movie_version + 1)
+
+    def test_response_cache_disabled_by_default(self):
+        res = self.client.get("/actors/1")
+
+        self.assertNotIn("X-Cache", res.headers)
+        self.assertEqual(
+            json.loads(self.client.get("/cache/stats").data)["enabled"], False
+        )
+
+    def test_response_cache_hits(self):
+        self.app.extensions["response_cache"] = ResponseCache(MemoryBackend(100))
+
+        first = self.client.get("/actors/1?x=1")
+        with captured_statements(self.app) as statements:
+            res = self.client.get("/actors/1?x=1")
+        queries = len(statements)
+
+        self.assertEqual(first.headers["X-Cache"], "MISS")
+        self.assertEqual(res.headers["X-Cache"], "HIT")
+        self.assertEqual(res.data, first.data)
+        self.assertEqual(res.get_etag(), first.get_etag())
+        self.assertEqual(queries, 0)
+
+        res = self.client.get(
+            "/actors/1?x=1", headers={"If-None-Match": first.headers["ETag"]}
+        )
+        self.assertEqual(res.status_code, 304)
+
+        stats = json.loads(self.client.get("/cache/stats").data)
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+        # The response and actor 1's fragment
+        self.assertEqual(stats["entries"], 2)
+
+    def test_response_cache_invalidation_is_precise(self):
+        self.app.extensions["response_cache"] = ResponseCache(MemoryBackend(100))
+        urls = ["/actors/1", "/actors/2", "/actors", "/movies/1", "/movies/2"]
+        for url in urls:
+            self.client.get(url)
+
+        def cached():
+            return [self.client.get(url).headers["X-Cache"] == "HIT" for url in urls]
+
+        self.assertEqual(cached(), [True] * 5)
+
+        with self.app.app_context():
+            Cast(movie_id=1, actor_id=1).add()
+        self.assertEqual(cached(), [False, True, False, False, True])
+
+        # Renaming movie 1 changes actor 1's nested view, not actor 2's
+        self.client.patch(
+            "/movies/1",
+            json=[{"op": "add", "path": "/title", "value": "Apollo 14"}],
+            content_type="application/json-patch+json",
+        )
+        self.assertEqual(cached(), [False, True, False, False, True])
+        self.assertEqual(
+            json.loads(self.client.get("/actors/1").data)["actor"]["movies"][0][
+                "title"
+            ],
+            "Apollo 14",
+        )
+
+        self.client.delete("/actors/2")
+        self.assertEqual(self.client.get("/actors/2").status_code, 404)
+
+    def test_fragment_cache_matches_serializer(self):
+        with self.app.app_context():
+            Cast(movie_id=1, actor_id=1).add()
+            Cast(movie_id=2, actor_id=1).add()
+            Cast(movie_id=1, actor_id=2).add()
+        urls = [
+            "/actors?include=movies",
+            "/actors?fields=name",
+            "/actors/1",
+            "/movies?include=actors",
+            "/movies/1",
+        ]
+        expected = [json.loads(self.client.get(url).data) for url in urls]
+        self.app.extensions["response_cache"] = ResponseCache(MemoryBackend(1000))
+
+        for x in range(2):
+            # A new query string each time, so only the fragments are reused
+            for url, data in zip(urls, expected):
+                res = self.client.get(f"{url}{'&' if '?' in url else '?'}x={x}")
+                self.assertEqual(res.headers["X-Cache"], "MISS")
+                self.assertEqual(json.loads(res.data), data)
+            stats = json.loads(self.client.get("/cache/stats").data)
+            if x == 0:
+                misses = stats["fragmentMisses"]
+        self.assertEqual(stats["fragmentMisses"], misses)
+        self.assertGreater(stats["fragmentHits"], 0)
+
+    def test_fragment_cache_follows_versions(self):
+        with self.app.app_context():
+            Cast(movie_id=1, actor_id=1).add()
+        self.app.extensions["response_cache"] = ResponseCache(MemoryBackend(1000))
+        self.client.get("/movies/1")
+        with captured_statements(self.app) as statements:
+            res = self.client.get("/movies/1?x=1")
+        queries = len(statements)
+
+        # Only the movie is loaded, its actors come with its fragment
+        self.assertEqual(queries, 1)
+        self.assertEqual(json.loads(res.data)["movie"]["actors"][0]["id"], 1)
+
+        self.client.patch(
+            "/actors/1",
+            json=[{"op": "add", "path": "/name", "value": "Renamed"}],
+            content_type="application/json-patch+json",
+        )
+        data = json.loads(self.client.get("/movies/1?x=2").data)
+        self.assertEqual(data["movie"]["actors"][0]["name"], "Renamed")
+
+    def test_response_cache_memory_backend(self):
+        backend = MemoryBackend(2)
+        backend.set("a", b"1")
+        backend.set("b", b"2")
+        backend.get("a")
+        backend.set("c", b"3", ex=60)
+        backend.set("d", b"4", ex=-1)
+        backend.incr("tag")
+
+        # LRU-bounded and expiring, but counters are kept
+        self.assertEqual(backend.mget(["a", "b", "c", "d"]), [None, None, b"3", None])
+        self.assertEqual(backend.get("tag"), 1)
+
+    def test_response_cache_versioned_keys(self):
+        cache = ResponseCache(MemoryBackend(100))
+        key = cache.key(("/actors/1",), ["actors:1"])
+        cache.set(key, b"cached")
+
+        self.assertEqual(cache.get(cache.key(("/actors/1",), ["actors:1"])), b"cached")
+        # Invalidation moves the tag on instead of finding and deleting entries
+        cache.invalidate(["actors:1"])
+        new_key = cache.key(("/actors/1",), ["actors:1"])
+        self.assertNotEqual(new_key, key)
+        self.assertIsNone(cache.get(new_key))
+
+    def test_response_cache_degrades_when_backend_is_down(self):
+        class Unreachable:
+            calls = 0
+
+            def __getattr__(self, name):
+                def fail(*args, **kwargs):
+                    Unreachable.calls += 1
+                    raise ConnectionError("connection refused")
+
+                return fail
+
+        cache = ResponseCache(Unreachable())
+        self.app.extensions["response_cache"] = cache
+
+        for _ in range(3):
+            res = self.client.get("/actors/1")
+            self.assertEqual(res.status_code, 200)
+            self.assertNotIn("X-Cache", res.headers)
+        with self.app.app_context():
+            Cast(movie_id=1, actor_id=1).add()
+
+        # Only the first attempt reached the backend
+        self.assertEqual(Unreachable.calls, 1)
+        self.assertEqual(cache.stats()["errors"], 1)
+        self.assertEqual(
+            len(json.loads(self.client.get("/actors/1").data)["actor"]["movies"]), 1
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
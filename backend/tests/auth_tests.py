@@ -0,0 +1,390 @@
+import json
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from cryptography.hazmat.primitives import serialization
+from flask import Flask, g
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+from werkzeug.exceptions import Forbidden
+
+from auth import jwks, validator
+from auth.backends import CryptographyBackend, JoseBackend
+from auth.jwks import KeyStore
+from auth.validator import (
+    AuthError,
+    TokenCache,
+    VerifiedClaims,
+    check_permissions,
+    requires_auth,
+    verify_decode_jwt,
+)
+
+DOMAIN = "audition.test"
+AUDIENCE = "casting"
+
+
+def make_key(kid: str):
+    """A fresh RSA key as (private PEM, public JWK)."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_pem = key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    public_jwk = jwk.construct(public_pem, "RS256").to_dict()
+    public_jwk.update({"kid": kid, "use": "sig"})
+    return private_pem, public_jwk
+
+
+def make_token(private_pem, kid: str, expires_in: int = 3600, **claims):
+    now = int(time.time())
+    payload = {
+        "iss": f"https://{DOMAIN}/",
+        "aud": AUDIENCE,
+        "sub": "auth0|tester",
+        "iat": now,
+        "exp": now + expires_in,
+        "permissions": ["read:actors", "read:movies"],
+        **claims,
+    }
+    return jwt.encode(payload, private_pem, algorithm="RS256", headers={"kid": kid})
+
+
+class JWKSStandIn:
+    """Answers KeyStore fetches locally and counts them, in place of requests.get."""
+
+    def __init__(self, keys: list[dict], cache_control: str = "max-age=600"):
+        self.keys = keys
+        self.cache_control = cache_control
+        self.down = False
+        self.calls = 0
+        # When set, fetches wait for this event, like a slow network
+        self.released = None
+
+    def __call__(self, url: str, timeout: int):
+        self.calls += 1
+        if self.released is not None:
+            self.released.wait(timeout)
+        if self.down:
+            raise ConnectionError("connection refused")
+        return self
+
+    @property
+    def headers(self):
+        return {"Cache-Control": self.cache_control}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"keys": list(self.keys)}
+
+
+class AuthTestCase(unittest.TestCase):
+    backend = JoseBackend
+
+    @classmethod
+    def setUpClass(cls):
+        cls.private_pem, cls.public_jwk = make_key("test-key")
+
+    def setUp(self):
+        self.cache = TokenCache(8, 30)
+        self.jwt_backend = self.backend()
+        self.jwks_server = JWKSStandIn([self.public_jwk])
+        self.key_store = KeyStore(
+            f"https://{DOMAIN}/.well-known/jwks.json",
+            self.jwt_backend.load_key,
+            fetch=self.jwks_server,
+        )
+        for name, value in (
+            ("jwt_backend", self.jwt_backend),
+            ("key_store", self.key_store),
+            ("AUTH0_DOMAIN", DOMAIN),
+            ("API_AUDIENCE", AUDIENCE),
+            ("ALGORITHMS", ["RS256"]),
+            ("token_cache", self.cache),
+        ):
+            patcher = patch.object(validator, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def decode_calls(self, token: str, times: int = 3):
+        # How often the signature is actually checked for `times` requests
+        with patch.object(
+            self.jwt_backend, "decode", wraps=self.jwt_backend.decode
+        ) as decode:
+            for _ in range(times):
+                claims = verify_decode_jwt(token)
+        return claims, decode.call_count
+
+    def test_verify_decode_jwt(self):
+        claims = verify_decode_jwt(make_token(self.private_pem, "test-key"))
+
+        self.assertEqual(claims["sub"], "auth0|tester")
+        self.assertEqual(
+            claims.permission_set, frozenset(["read:actors", "read:movies"])
+        )
+
+    def test_verified_token_is_cached(self):
+        token = make_token(self.private_pem, "test-key")
+
+        claims, calls = self.decode_calls(token)
+
+        self.assertEqual(calls, 1)
+        self.assertEqual(claims["sub"], "auth0|tester")
+        self.assertEqual(len(self.cache), 1)
+
+    def test_token_near_expiry_is_not_cached(self):
+        # Inside the clock-skew margin: verified, but every time
+        token = make_token(self.private_pem, "test-key", expires_in=10)
+
+        _, calls = self.decode_calls(token)
+
+        self.assertEqual(calls, 3)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_cached_token_expires(self):
+        token = make_token(self.private_pem, "test-key", expires_in=120)
+        verify_decode_jwt(token)
+
+        with patch.object(validator.time, "time", return_value=time.time() + 100):
+            self.assertIsNone(self.cache.get(token))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_rejected_token_is_not_cached(self):
+        other_pem, _ = make_key("test-key")
+        token = make_token(other_pem, "test-key")
+
+        for _ in range(2):
+            with self.assertRaises(AuthError) as context:
+                verify_decode_jwt(token)
+            self.assertEqual(context.exception.status_code, 403)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_expired_token(self):
+        token = make_token(self.private_pem, "test-key", expires_in=-60)
+
+        with self.assertRaises(AuthError) as context:
+            verify_decode_jwt(token)
+        self.assertEqual(context.exception.error["code"], "token_expired")
+        self.assertEqual(context.exception.status_code, 401)
+
+    def test_keys_are_fetched_once(self):
+        for expires_in in (3600, 3601, 3602):
+            verify_decode_jwt(make_token(self.private_pem, "test-key", expires_in))
+
+        self.assertEqual(self.jwks_server.calls, 1)
+
+    def test_unknown_kid_refreshes_keys(self):
+        verify_decode_jwt(make_token(self.private_pem, "test-key"))
+        # The identity provider rotates in a new key
+        new_pem, new_jwk = make_key("new-key")
+        self.jwks_server.keys.append(new_jwk)
+
+        with patch.object(jwks.time, "monotonic", return_value=time.monotonic() + 60):
+            claims = verify_decode_jwt(make_token(new_pem, "new-key"))
+
+        self.assertEqual(claims["sub"], "auth0|tester")
+        self.assertEqual(self.jwks_server.calls, 2)
+
+    def test_unknown_kid_refresh_is_rate_limited(self):
+        verify_decode_jwt(make_token(self.private_pem, "test-key"))
+
+        for _ in range(5):
+            with self.assertRaises(AuthError) as context:
+                verify_decode_jwt(make_token(self.private_pem, "unknown-key"))
+            self.assertEqual(context.exception.status_code, 403)
+        # All within MIN_REFRESH_INTERVAL of the initial fetch
+        self.assertEqual(self.jwks_server.calls, 1)
+
+    def test_keys_expire_with_cache_control(self):
+        self.jwks_server.cache_control = "public, max-age=600"
+        verify_decode_jwt(make_token(self.private_pem, "test-key", 3600))
+
+        later = time.monotonic() + 500
+        with patch.object(jwks.time, "monotonic", return_value=later):
+            verify_decode_jwt(make_token(self.private_pem, "test-key", 3601))
+        self.assertEqual(self.jwks_server.calls, 1)
+        with patch.object(jwks.time, "monotonic", return_value=later + 200):
+            # Served from the stale keys while they refresh in the background
+            with patch.object(self.jwks_server, "down", True):
+                claims = verify_decode_jwt(
+                    make_token(self.private_pem, "test-key", 3602)
+                )
+                self.key_store._refresh_thread.join()
+        self.assertEqual(claims["sub"], "auth0|tester")
+        self.assertEqual(self.jwks_server.calls, 2)
+
+    def test_stale_keys_are_served_during_a_slow_refresh(self):
+        verify_decode_jwt(make_token(self.private_pem, "test-key"))
+        self.jwks_server.released = threading.Event()
+
+        with patch.object(jwks.time, "monotonic", return_value=time.monotonic() + 700):
+            self.assertIsNotNone(self.key_store.get("test-key"))
+            while self.jwks_server.calls < 2:  # Until the refresh is fetching
+                time.sleep(0.01)
+            start = time.perf_counter()
+            for _ in range(5):
+                self.assertIsNotNone(self.key_store.get("test-key"))
+            elapsed = time.perf_counter() - start
+            self.jwks_server.released.set()
+            self.key_store._refresh_thread.join()
+
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(self.jwks_server.calls, 2)
+
+    def test_failed_refresh_starts_one_thread_per_backoff(self):
+        verify_decode_jwt(make_token(self.private_pem, "test-key"))
+        self.jwks_server.down = True
+        later = time.monotonic() + 700
+
+        with patch.object(jwks.threading, "Thread", wraps=threading.Thread) as thread:
+            for now, threads in ((later, 1), (later + 0.5, 1), (later + 2, 2)):
+                with patch.object(jwks.time, "monotonic", return_value=now):
+                    for _ in range(50):
+                        self.assertIsNotNone(self.key_store.get("test-key"))
+                        self.key_store._refresh_thread.join()
+                self.assertEqual(thread.call_count, threads)
+        self.assertEqual(self.jwks_server.calls, 3)
+
+    def test_short_max_age_is_raised_to_minimum(self):
+        for cache_control in ("max-age=5", "no-cache", "no-store"):
+            self.jwks_server.cache_control = cache_control
+            self.key_store.refresh()
+            self.assertGreater(
+                self.key_store._expires, time.monotonic() + jwks.MIN_MAX_AGE - 5
+            )
+            self.key_store._next_refresh = 0.0
+
+    def test_failed_fetch_backs_off(self):
+        self.jwks_server.down = True
+        token = make_token(self.private_pem, "test-key")
+
+        for _ in range(3):
+            with self.assertRaises(AuthError) as context:
+                verify_decode_jwt(token)
+            self.assertEqual(context.exception.error["code"], "jwks_failure")
+            self.assertEqual(context.exception.status_code, 500)
+        self.assertEqual(self.jwks_server.calls, 1)
+
+        # Retried once the backoff has passed; stale keys stay in use meanwhile
+        self.jwks_server.down = False
+        with patch.object(jwks.time, "monotonic", return_value=time.monotonic() + 2):
+            self.assertEqual(verify_decode_jwt(token)["sub"], "auth0|tester")
+        self.assertEqual(self.jwks_server.calls, 2)
+
+    def test_keys_load_from_file(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as f:
+            json.dump({"keys": [self.public_jwk]}, f)
+            f.flush()
+            self.key_store.load_file(f.name)
+
+        claims = verify_decode_jwt(make_token(self.private_pem, "test-key"))
+
+        self.assertEqual(claims["sub"], "auth0|tester")
+        self.assertEqual(self.jwks_server.calls, 0)
+
+    def assertAuthError(self, token: str, code: str, status_code: int):
+        with self.assertRaises(AuthError) as context:
+            verify_decode_jwt(token)
+        self.assertEqual(context.exception.error["code"], code)
+        self.assertEqual(context.exception.status_code, status_code)
+
+    def test_invalid_claims(self):
+        for claims in (
+            {"aud": "another-api"},
+            {"aud": ["another-api", "more-apis"]},
+            {"iss": "https://elsewhere.test/"},
+            {"nbf": int(time.time()) + 600},
+            {"sub": 42},
+        ):
+            token = make_token(self.private_pem, "test-key", **claims)
+            self.assertAuthError(token, "invalid_claims", 403)
+
+    def test_invalid_tokens(self):
+        valid = make_token(self.private_pem, "test-key")
+        header, payload, signature = valid.split(".")
+        tampered = make_token(self.private_pem, "test-key", permissions=["*"])
+        hs256 = jwt.encode(
+            {"sub": "x"}, "secret", algorithm="HS256", headers={"kid": "test-key"}
+        )
+
+        for token in (
+            f"{header}.{tampered.split('.')[1]}.{signature}",
+            f"{header}.{payload}.{signature[:-4]}AAAA",
+            hs256,
+        ):
+            self.assertAuthError(token, "invalid_header", 403)
+        for token in ("not-a-token", "a.b.c", f"{payload}.{payload}.{signature}"):
+            self.assertAuthError(token, "invalid_header", 401)
+        self.assertAuthError(
+            make_token(self.private_pem, "unknown-key"), "invalid_header", 403
+        )
+
+    def test_token_cache_is_bounded(self):
+        cache = TokenCache(2, 30)
+        exp = int(time.time()) + 3600
+        for token in ("a", "b", "c"):
+            cache.set(token, VerifiedClaims({"exp": exp, "sub": token}))
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c")["sub"], "c")
+
+    def test_token_cache_disabled(self):
+        cache = TokenCache(0, 30)
+        cache.set("a", VerifiedClaims({"exp": int(time.time()) + 3600}))
+
+        self.assertIsNone(cache.get("a"))
+
+    def test_check_permissions(self):
+        claims = VerifiedClaims({"permissions": ["read:actors"]})
+
+        self.assertTrue(check_permissions("read:actors", claims))
+        self.assertTrue(
+            check_permissions("read:actors", {"permissions": ["read:actors"]})
+        )
+        for payload in (claims, {"permissions": ["read:actors"]}, {}):
+            with self.assertRaises(AuthError) as context:
+                check_permissions("delete:actors", payload)
+            self.assertEqual(context.exception.status_code, 403)
+
+    def test_requires_auth_checks_every_permission(self):
+        app = Flask(__name__)
+        view = requires_auth("create:casts", "delete:casts")(lambda: "ok")
+
+        for permissions, allowed in (
+            (["create:casts"], False),
+            (["create:casts", "delete:casts"], True),
+        ):
+            token = make_token(self.private_pem, "test-key", permissions=permissions)
+            headers = {"Authorization": f"Bearer {token}"}
+            with (
+                app.test_request_context(headers=headers),
+                patch.object(
+                    validator, "verify_decode_jwt", wraps=verify_decode_jwt
+                ) as verify,
+            ):
+                if allowed:
+                    self.assertEqual(view(), "ok")
+                    self.assertEqual(g.permission, "create:casts delete:casts")
+                else:
+                    self.assertRaises(Forbidden, view)
+            # One verification however many permissions are required
+            self.assertEqual(verify.call_count, 1)
+
+
+class CryptographyAuthTestCase(AuthTestCase):
+    # Every test again, against the cryptography backend
+    backend = CryptographyBackend
+
+
+if __name__ == "__main__":
+    unittest.main()
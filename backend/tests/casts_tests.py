@@ -1,11 +1,14 @@
 from functools import wraps
 import os
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
 import json
 from unittest.mock import patch
 
-from sqlalchemy import text, create_engine
+from sqlalchemy import event, text, create_engine
 
 
 def mock_decorator_function(*args, **kwargs):
@@ -24,8 +27,9 @@ def mock_decorator_function(*args, **kwargs):
 patch("auth.validator.requires_auth", mock_decorator_function).start()
 
 from app import create_app
-from models import Cast, db
+from models import Actor, Cast, Movie, db
 from utilities.hydrate_db import make_movies, make_actors
+from tests import captured_statements
 from dotenv import load_dotenv
 import json
 
@@ -76,12 +80,18 @@ class CastTestCase(unittest.TestCase):
     def test_create_cast(self):
         new_cast = {"movieId": 1, "actorId": 1}
 
-        res = self.client.post("/casts", json=new_cast, content_type="application/json")
+        with captured_statements(self.app) as statements:
+            res = self.client.post(
+                "/casts", json=new_cast, content_type="application/json"
+            )
         data = json.loads(res.data)
 
         self.assertEqual(res.status_code, 201)
         self.assertTrue(data["success"])
         self.assertEqual(data["id"], "movie-1-actor-1")
+        # The locks and the INSERT are one statement; the version bumps follow
+        self.assertIn("INSERT INTO casts", statements[0])
+        self.assertIn("FOR NO KEY UPDATE", statements[0])
 
     def test_create_cast_400_bad_data(self):
         new_cast = {"movieId": "quack", "actorId": "moo"}
@@ -92,7 +102,7 @@ class CastTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 400)
         self.assertFalse(data["success"])
 
-    def test_create_cast_400_cast_already_exists(self):
+    def test_create_cast_409_cast_already_exists(self):
         new_cast = {"movieId": 1, "actorId": 1}
 
         res = self.client.post("/casts", json=new_cast, content_type="application/json")
@@ -109,8 +119,151 @@ class CastTestCase(unittest.TestCase):
         )
         data = json.loads(res.data)
 
-        self.assertEqual(res.status_code, 400)
-        self.assertFalse(data["success"])
+        self.assertEqual(res.status_code, 409)
+        self.assertEqual(data, {"success": False, "error": "Conflict"})
+
+    def test_create_cast_404_unknown_movie_or_actor(self):
+        for new_cast in (
+            {"movieId": 999, "actorId": 1},
+            {"movieId": 1, "actorId": 999},
+        ):
+            res = self.client.post("/casts", json=new_cast)
+            data = json.loads(res.data)
+
+            self.assertEqual(res.status_code, 404)
+            self.assertEqual(data, {"success": False, "error": "Not Found"})
+        with self.app.app_context():
+            self.assertEqual(Cast.query.count(), 0)
+
+    def test_create_cast_concurrently(self):
+        # Many identical assignments at once: one wins, the rest see a conflict
+        with self.app.app_context():
+            version = db.session.get(Movie, 1).version
+        barrier = threading.Barrier(12)
+
+        def assign():
+            client = self.app.test_client()
+            barrier.wait()
+            return client.post("/casts", json={"movieId": 1, "actorId": 1}).status_code
+
+        with ThreadPoolExecutor(max_workers=12) as executor:
+            statuses = list(executor.map(lambda _: assign(), range(12)))
+
+        self.assertEqual(sorted(statuses), [201] + [409] * 11)
+        with self.app.app_context():
+            self.assertEqual(Cast.query.count(), 1)
+            self.assertEqual(db.session.get(Movie, 1).version, version + 1)
+
+    def _interleaved(self, *requests):
+        """
+        Sends each (method, path, kwargs) from its own thread at once, with
+        every write slowed down so the transactions overlap. Returns the
+        status codes in order.
+        """
+        with self.app.app_context():
+            engine = db.engine
+        barrier = threading.Barrier(len(requests))
+
+        def slow_writes(conn, cursor, statement, *args):
+            if statement.startswith(("UPDATE", "INSERT")):
+                time.sleep(0.2)
+
+        def send(method: str, path: str, kwargs: dict):
+            client = self.app.test_client()
+            barrier.wait()
+            return getattr(client, method)(path, **kwargs).status_code
+
+        event.listen(engine, "after_cursor_execute", slow_writes)
+        try:
+            with ThreadPoolExecutor(max_workers=len(requests)) as executor:
+                futures = [executor.submit(send, *request) for request in requests]
+                return [future.result() for future in futures]
+        finally:
+            event.remove(engine, "after_cursor_execute", slow_writes)
+
+    def test_patch_actor_and_movie_concurrently(self):
+        # An actor PATCH bumps its movies' versions and a movie PATCH its
+        # actors'; with both in flight they must queue, not deadlock
+        with self.app.app_context():
+            Cast(movie_id=1, actor_id=1).add()
+            actor_version = db.session.get(Actor, 1).version
+            movie_version = db.session.get(Movie, 1).version
+
+        def patch(field: str, value):
+            return {
+                "json": [{"op": "add", "path": field, "value": value}],
+                "content_type": "application/json-patch+json",
+            }
+
+        statuses = self._interleaved(
+            ("patch", "/actors/1", patch("/age", 70)),
+            ("patch", "/movies/1", patch("/title", "Apollo 14")),
+        )
+
+        self.assertEqual(statuses, [200, 200])
+        with self.app.app_context():
+            # Each changed itself and was bumped by the other
+            self.assertEqual(db.session.get(Actor, 1).version, actor_version + 2)
+            self.assertEqual(db.session.get(Movie, 1).version, movie_version + 2)
+
+    def test_create_cast_while_replacing_casts(self):
+        with self.app.app_context():
+            Cast(movie_id=1, actor_id=1).add()
+
+        statuses = self._interleaved(
+            ("post", "/casts", {"json": {"movieId": 2, "actorId": 1}}),
+            ("put", "/movies/2/actors", {"json": {"actorIds": [1, 2]}}),
+        )
+
+        self.assertIn(statuses[0], (201, 409))
+        self.assertEqual(statuses[1], 200)
+        self.assertEqual(self._cast_ids(2), [1, 2])
+
+    def test_cast_added_while_replacing_casts(self):
+        # A cast added between the replacement's first read of the casts and
+        # its locks: the replacement must lock that actor before the movie too,
+        # or it deadlocks with a writer holding the actor and waiting for the movie
+        with self.app.app_context():
+            engine = db.engine
+        writer = self.engine.connect()
+        errors = []
+
+        def lock_movie_later():
+            time.sleep(0.5)
+            try:
+                writer.execute(
+                    text("SELECT id FROM movies WHERE id = 2 FOR NO KEY UPDATE")
+                )
+                writer.commit()
+            except Exception as error:
+                errors.append(error)
+                writer.rollback()
+
+        thread = threading.Thread(target=lock_movie_later)
+
+        def add_cast(conn, cursor, statement, *args):
+            if statement.startswith("SELECT casts.actor_id") and not thread.ident:
+                with self.engine.begin() as connection:
+                    connection.execute(
+                        text("INSERT INTO casts (movie_id, actor_id) VALUES (2, 3)")
+                    )
+                writer.execute(
+                    text("SELECT id FROM actors WHERE id = 3 FOR NO KEY UPDATE")
+                )
+                thread.start()
+
+        event.listen(engine, "after_cursor_execute", add_cast)
+        try:
+            res = self.client.put("/movies/2/actors", json={"actorIds": [1]})
+            thread.join()
+        finally:
+            event.remove(engine, "after_cursor_execute", add_cast)
+            writer.close()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(json.loads(res.data)["removed"], [3])
+        self.assertEqual(self._cast_ids(2), [1])
 
     def test_create_cast_415(self):
         payload = 0b10101010
@@ -124,6 +277,32 @@ class CastTestCase(unittest.TestCase):
         self.assertFalse(data["success"])
         self.assertEqual(data["error"], "Unsupported Media Type")
 
+    def test_export_casts(self):
+        with self.app.app_context():
+            db.session.add_all(
+                [Cast(movie_id=2, actor_id=1), Cast(movie_id=1, actor_id=3)]
+            )
+            db.session.commit()
+
+        res = self.client.get("/casts/export")
+        lines = res.get_data(as_text=True).splitlines()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, "application/x-ndjson")
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [{"actorId": 3, "movieId": 1}, {"actorId": 1, "movieId": 2}],
+        )
+
+    def test_export_casts_since_future_is_empty(self):
+        with self.app.app_context():
+            Cast(movie_id=1, actor_id=1).add()
+
+        res = self.client.get("/casts/export?since=2999-01-01")
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_data(as_text=True), "")
+
     def test_delete_cast(self):
         with self.app.app_context():
             cast = Cast(movie_id=1, actor_id=1)
@@ -136,6 +315,27 @@ class CastTestCase(unittest.TestCase):
         self.assertTrue(data["success"])
         self.assertEqual(data["id"], "movie-1-actor-1")
 
+    def test_cast_changes_bump_versions(self):
+        with self.app.app_context():
+            versions = (
+                db.session.get(Actor, 1).version,
+                db.session.get(Movie, 1).version,
+            )
+
+        self.client.post("/casts", json={"movieId": 1, "actorId": 1})
+        with self.app.app_context():
+            self.assertEqual(
+                (db.session.get(Actor, 1).version, db.session.get(Movie, 1).version),
+                (versions[0] + 1, versions[1] + 1),
+            )
+
+        self.client.delete("/casts/movies/1/actors/1")
+        with self.app.app_context():
+            self.assertEqual(
+                (db.session.get(Actor, 1).version, db.session.get(Movie, 1).version),
+                (versions[0] + 2, versions[1] + 2),
+            )
+
     def test_delete_cast_404_bad_movie_id(self):
         # Flask automatically validates the route params, and 404s if they are bad
         with self.app.app_context():
@@ -162,6 +362,110 @@ class CastTestCase(unittest.TestCase):
         self.assertFalse(data["success"])
         self.assertEqual(data["error"], "Not Found")
 
+    def _cast_ids(self, movie_id: int):
+        with self.app.app_context():
+            return sorted(
+                cast.actor_id
+                for cast in Cast.query.filter(Cast.movie_id == movie_id).all()
+            )
+
+    def test_replace_movie_actors(self):
+        with self.app.app_context():
+            db.session.add_all(
+                [Cast(movie_id=1, actor_id=1), Cast(movie_id=1, actor_id=2)]
+            )
+            db.session.commit()
+            versions = [db.session.get(Actor, id).version for id in (1, 2, 3, 5)]
+
+        res = self.client.put("/movies/1/actors", json={"actorIds": [2, 3, 4, 3]})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            data, {"success": True, "id": 1, "added": [3, 4], "removed": [1]}
+        )
+        self.assertEqual(self._cast_ids(1), [2, 3, 4])
+        with self.app.app_context():
+            # Only the actors that gained or lost the movie changed
+            self.assertEqual(
+                [db.session.get(Actor, id).version for id in (1, 2, 3, 5)],
+                [versions[0] + 1, versions[1], versions[2] + 1, versions[3]],
+            )
+
+    def test_replace_movie_actors_unchanged(self):
+        self.client.put("/movies/1/actors", json={"actorIds": [1, 2]})
+        with self.app.app_context():
+            version = db.session.get(Movie, 1).version
+
+        res = self.client.put("/movies/1/actors", json={"actorIds": [2, 1]})
+
+        self.assertEqual(json.loads(res.data)["added"], [])
+        self.assertEqual(json.loads(res.data)["removed"], [])
+        with self.app.app_context():
+            self.assertEqual(db.session.get(Movie, 1).version, version)
+
+    def test_replace_movie_actors_large_cast_in_one_request(self):
+        with self.app.app_context():
+            db.session.add_all(
+                [Actor(f"Extra {i}", 30, None, None) for i in range(200)]
+            )
+            db.session.commit()
+            actor_ids = [actor.id for actor in Actor.query.all()][:200]
+        with captured_statements(self.app) as statements:
+            res = self.client.put("/movies/1/actors", json={"actorIds": actor_ids})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(json.loads(res.data)["added"]), 200)
+        self.assertEqual(self._cast_ids(1), sorted(actor_ids))
+        # Read, lock, re-read under the lock, DELETE, INSERT, then the version bumps
+        self.assertEqual(
+            len([s for s in statements if s.startswith("INSERT INTO casts")]), 1
+        )
+        self.assertLess(len(statements), 15)
+
+        res = self.client.put("/movies/1/actors", json={"actorIds": []})
+        self.assertEqual(len(json.loads(res.data)["removed"]), 200)
+        self.assertEqual(self._cast_ids(1), [])
+
+    def test_replace_actor_movies(self):
+        with self.app.app_context():
+            Cast(movie_id=1, actor_id=1).add()
+
+        res = self.client.put("/actors/1/movies", json={"movieIds": [2, 3]})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            data, {"success": True, "id": 1, "added": [2, 3], "removed": [1]}
+        )
+        self.assertEqual(self._cast_ids(1), [])
+        self.assertEqual(self._cast_ids(2), [1])
+
+    def test_replace_casts_404(self):
+        with self.app.app_context():
+            Cast(movie_id=1, actor_id=1).add()
+
+        for url, body in (
+            ("/movies/999/actors", {"actorIds": [1]}),
+            ("/movies/1/actors", {"actorIds": [2, 999]}),
+            ("/actors/999/movies", {"movieIds": []}),
+        ):
+            res = self.client.put(url, json=body)
+            self.assertEqual(res.status_code, 404)
+        # Nothing was applied
+        self.assertEqual(self._cast_ids(1), [1])
+
+    def test_replace_casts_400(self):
+        for body in (
+            [1, 2],
+            {"movieIds": [1]},
+            {"actorIds": "1,2"},
+            {"actorIds": [1, "2"]},
+            {"actorIds": [True]},
+        ):
+            res = self.client.put("/movies/1/actors", json=body)
+            self.assertEqual(res.status_code, 400)
+
 
 # Make the tests conveniently executable
 if __name__ == "__main__":
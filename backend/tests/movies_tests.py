@@ -6,6 +6,7 @@ from sqlalchemy import text, create_engine
 from app import create_app
 from models import Cast, db, Movie
 from utilities.hydrate_db import make_movies, make_actors
+from tests import captured_statements
 from dotenv import load_dotenv
 import json
 
@@ -60,6 +61,26 @@ class MovieTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 401)
         self.assertEqual(data["error"], "Unauthorized")
 
+    def test_cache_stats_unauthorized(self):
+        res = self.client.get("/cache/stats")
+
+        self.assertEqual(res.status_code, 401)
+
+    @patch("auth.validator.get_token_auth_header")
+    @patch("auth.validator.verify_decode_jwt")
+    def test_cache_stats_requires_permission(
+        self, mock_verify_decode_jwt, mock_get_token_auth_header
+    ):
+        mock_get_token_auth_header.return_value = True
+        mock_verify_decode_jwt.return_value = {"permissions": ["read:movies"]}
+        res = self.client.get("/cache/stats")
+        self.assertEqual(res.status_code, 403)
+
+        mock_verify_decode_jwt.return_value = {"permissions": ["read:actors"]}
+        res = self.client.get("/cache/stats")
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(json.loads(res.data)["success"])
+
     @patch("auth.validator.get_token_auth_header")
     @patch("auth.validator.verify_decode_jwt")
     def test_get_movies_casting_assistant(
@@ -117,6 +138,166 @@ class MovieTestCase(unittest.TestCase):
         )
         self.assertEqual(data["offset"], 10)
 
+    @patch("auth.validator.get_token_auth_header")
+    @patch("auth.validator.verify_decode_jwt")
+    def test_get_movies_cursor_pagination(
+        self, mock_verify_decode_jwt, mock_get_token_auth_header
+    ):
+        mock_get_token_auth_header.return_value = True
+        mock_verify_decode_jwt.return_value = {"permissions": ["read:movies"]}
+
+        res = self.client.get("/movies?cursor=&limit=6")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(data["movies"]), 6)
+        self.assertEqual(data["totalMovies"], 11)
+        self.assertIsNotNone(data["nextCursor"])
+
+        res = self.client.get(f"/movies?cursor={data['nextCursor']}&limit=6")
+        data2 = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(data2["movies"]), 5)
+        self.assertIsNone(data2["nextCursor"])
+        self.assertEqual(data2["movies"][-1]["id"], 6)
+
+    @patch("auth.validator.get_token_auth_header")
+    @patch("auth.validator.verify_decode_jwt")
+    def test_get_movies_cursor_count_none(
+        self, mock_verify_decode_jwt, mock_get_token_auth_header
+    ):
+        mock_get_token_auth_header.return_value = True
+        mock_verify_decode_jwt.return_value = {"permissions": ["read:movies"]}
+
+        res = self.client.get("/movies?cursor=&limit=6&count=none")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn("totalMovies", data)
+        self.assertTrue(data["hasMore"])
+
+    @patch("auth.validator.get_token_auth_header")
+    @patch("auth.validator.verify_decode_jwt")
+    def test_get_movies_query_count_independent_of_page_contents(
+        self, mock_verify_decode_jwt, mock_get_token_auth_header
+    ):
+        mock_get_token_auth_header.return_value = True
+        mock_verify_decode_jwt.return_value = {"permissions": ["read:movies"]}
+
+        with captured_statements(self.app) as statements:
+            res = self.client.get("/movies")
+        bare_queries = len(statements)
+        self.assertEqual(res.status_code, 200)
+
+        with self.app.app_context():
+            db.session.add_all(
+                [
+                    Cast(movie_id=movie_id, actor_id=actor_id)
+                    for movie_id in range(1, 12)
+                    for actor_id in range(1, 20)
+                ]
+            )
+            db.session.commit()
+
+        with captured_statements(self.app) as statements:
+            res = self.client.get("/movies")
+        cast_queries = len(statements)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(all(len(movie["actors"]) == 19 for movie in data["movies"]))
+        # The collection version, the page and one select-in load for actors
+        self.assertEqual(bare_queries, 3)
+        self.assertEqual(cast_queries, 3)
+
+        names = [actor["name"] for actor in data["movies"][0]["actors"]]
+        self.assertEqual(names, sorted(names))
+
+        with captured_statements(self.app) as statements:
+            res = self.client.get("/movies/1")
+        detail_queries = len(statements)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(json.loads(res.data)["movie"]["actors"]), 19)
+        self.assertEqual(detail_queries, 1)
+
+    @patch("auth.validator.get_token_auth_header")
+    @patch("auth.validator.verify_decode_jwt")
+    def test_get_movies_render_db_matches_orm(
+        self, mock_verify_decode_jwt, mock_get_token_auth_header
+    ):
+        mock_get_token_auth_header.return_value = True
+        mock_verify_decode_jwt.return_value = {"permissions": ["read:movies"]}
+
+        for params in ("", "&include=actors", "&search=the&count=none", "&cursor="):
+            orm = self.client.get("/movies?limit=5" + params)
+            db_rendered = self.client.get("/movies?limit=5&render=db" + params)
+
+            self.assertEqual(db_rendered.status_code, 200)
+            self.assertEqual(json.loads(db_rendered.data), json.loads(orm.data))
+
+    @patch("auth.validator.get_token_auth_header")
+    @patch("auth.validator.verify_decode_jwt")
+    def test_get_movies_sparse_fieldset(
+        self, mock_verify_decode_jwt, mock_get_token_auth_header
+    ):
+        mock_get_token_auth_header.return_value = True
+        mock_verify_decode_jwt.return_value = {"permissions": ["read:movies"]}
+
+        # Warm the once-per-process search capability probe
+        self.client.get("/movies?search=warm")
+        with captured_statements(self.app) as statements:
+            res = self.client.get(
+                "/movies?search=apollo&fields=title,releaseDate&include="
+            )
+        queries = len(statements)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            data["movies"],
+            [{"id": 1, "releaseDate": "1995-06-30", "title": "Apollo 13"}],
+        )
+        # The collection version and the page
+        self.assertEqual(queries, 2)
+
+    @patch("auth.validator.get_token_auth_header")
+    @patch("auth.validator.verify_decode_jwt")
+    def test_export_movies(self, mock_verify_decode_jwt, mock_get_token_auth_header):
+        mock_get_token_auth_header.return_value = True
+        mock_verify_decode_jwt.return_value = {"permissions": ["read:movies"]}
+
+        res = self.client.get("/movies/export")
+        movies = [json.loads(line) for line in res.get_data(as_text=True).splitlines()]
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, "application/x-ndjson")
+        with self.app.app_context():
+            self.assertEqual(len(movies), Movie.query.count())
+        self.assertEqual(
+            [movie["id"] for movie in movies], sorted(movie["id"] for movie in movies)
+        )
+        self.assertEqual(
+            sorted(movies[0].keys()),
+            ["genre", "id", "posterUrl", "releaseDate", "title"],
+        )
+
+    @patch("auth.validator.get_token_auth_header")
+    @patch("auth.validator.verify_decode_jwt")
+    def test_suggest_movies(self, mock_verify_decode_jwt, mock_get_token_auth_header):
+        mock_get_token_auth_header.return_value = True
+        mock_verify_decode_jwt.return_value = {"permissions": ["read:movies"]}
+
+        res = self.client.get("/movies/suggest?search=the&limit=3")
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(data["suggestions"]), 3)
+        self.assertTrue(
+            all(set(item.keys()) == {"id", "label"} for item in data["suggestions"])
+        )
+        self.assertTrue(data["suggestions"][0]["label"].lower().startswith("the"))
+
     @patch("auth.validator.get_token_auth_header")
     @patch("auth.validator.verify_decode_jwt")
     def test_get_movies_bad_query_param_type_200(
@@ -269,6 +450,55 @@ class MovieTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 401)
         self.assertEqual(data["error"], "Unauthorized")
 
+    @patch("auth.validator.get_token_auth_header")
+    @patch("auth.validator.verify_decode_jwt")
+    def test_create_movies_batch(
+        self, mock_verify_decode_jwt, mock_get_token_auth_header
+    ):
+        mock_get_token_auth_header.return_value = True
+        mock_verify_decode_jwt.return_value = {"permissions": ["create:movies"]}
+
+        new_movies = [
+            {"genre": "COMEDY", "title": "Wayne's World", "releaseDate": "1992-02-14"},
+            {"genre": "COMEDY", "title": "   "},
+            {"genre": "DRAMA", "title": "Heat", "releaseDate": "14/12/1995"},
+            {
+                "genre": "ACTION_AND_ADVENTURE",
+                "title": "Ronin",
+                "posterUrl": "https://example.com/r.jpg",
+            },
+        ]
+        res = self.client.post("/movies:batch", json=new_movies)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual([id is None for id in data["ids"]], [False, True, True, False])
+        self.assertEqual(
+            data["errors"],
+            [
+                {"index": 1, "error": "title must be a non-empty string"},
+                {"index": 2, "error": "releaseDate must be YYYY-MM-DD"},
+            ],
+        )
+        with self.app.app_context():
+            movie = db.session.get(Movie, data["ids"][0])
+            self.assertEqual(movie.release_date.isoformat(), "1992-02-14")
+
+    @patch("auth.validator.get_token_auth_header")
+    @patch("auth.validator.verify_decode_jwt")
+    def test_create_movies_batch_casting_director_error_403(
+        self, mock_verify_decode_jwt, mock_get_token_auth_header
+    ):
+        mock_get_token_auth_header.return_value = True
+        mock_verify_decode_jwt.return_value = {"permissions": ["modify:movies"]}
+
+        res = self.client.post(
+            "/movies:batch", json=[{"genre": "COMEDY", "title": "Wayne's World"}]
+        )
+
+        self.assertEqual(res.status_code, 403)
+        self.assertEqual(json.loads(res.data)["error"], "Forbidden")
+
     @patch("auth.validator.get_token_auth_header")
     @patch("auth.validator.verify_decode_jwt")
     def test_create_movie_without_release_date_or_poster_url(
@@ -451,6 +681,25 @@ class MovieTestCase(unittest.TestCase):
             },
         )
 
+    @patch("auth.validator.get_token_auth_header")
+    @patch("auth.validator.verify_decode_jwt")
+    def test_get_movie_if_none_match(
+        self, mock_verify_decode_jwt, mock_get_token_auth_header
+    ):
+        mock_get_token_auth_header.return_value = True
+        mock_verify_decode_jwt.return_value = {"permissions": ["read:movies"]}
+        etag = self.client.get("/movies/1").get_etag()[0]
+
+        res = self.client.get("/movies/1", headers={"If-None-Match": f'W/"{etag}"'})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b"")
+
+        with self.app.app_context():
+            Cast(movie_id=1, actor_id=1).add()
+        res = self.client.get("/movies/1", headers={"If-None-Match": f'"{etag}"'})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.get_etag()[0], etag)
+
     @patch("auth.validator.get_token_auth_header")
     @patch("auth.validator.verify_decode_jwt")
     def test_get_movie_404(self, mock_verify_decode_jwt, mock_get_token_auth_header):
@@ -709,6 +958,34 @@ class MovieTestCase(unittest.TestCase):
             movie_or_none = Movie.query.filter(Movie.id == 2).one_or_none()
             self.assertEqual(movie_or_none, None)
 
+    @patch("auth.validator.get_token_auth_header")
+    @patch("auth.validator.verify_decode_jwt")
+    def test_patch_and_delete_movie_if_match(
+        self, mock_verify_decode_jwt, mock_get_token_auth_header
+    ):
+        mock_get_token_auth_header.return_value = True
+        mock_verify_decode_jwt.return_value = {
+            "permissions": ["read:movies", "modify:movies", "delete:movies"]
+        }
+        etag = self.client.get("/movies/2").get_etag()[0]
+
+        res = self.client.patch(
+            "/movies/2",
+            json=[{"op": "add", "path": "/title", "value": "Renamed"}],
+            content_type="application/json-patch+json",
+            headers={"If-Match": f'"{etag}"'},
+        )
+        etag2 = res.get_etag()[0]
+        self.assertEqual(res.status_code, 200)
+
+        res = self.client.delete("/movies/2", headers={"If-Match": f'"{etag}"'})
+        self.assertEqual(res.status_code, 412)
+
+        res = self.client.delete("/movies/2", headers={"If-Match": f'"{etag2}"'})
+        self.assertEqual(res.status_code, 200)
+        with self.app.app_context():
+            self.assertIsNone(db.session.get(Movie, 2))
+
     @patch("auth.validator.get_token_auth_header")
     @patch("auth.validator.verify_decode_jwt")
     def test_delete_movie_error(
@@ -1,6 +1,7 @@
 import unittest
 
 from tests.actors_tests import ActorTestCase
+from tests.auth_tests import AuthTestCase, CryptographyAuthTestCase
 from tests.casts_tests import CastTestCase
 from tests.movies_tests import MovieTestCase
 
@@ -10,6 +11,10 @@ def suite():
     suite.addTests(unittest.defaultTestLoader.loadTestsFromTestCase(MovieTestCase))
     suite.addTests(unittest.defaultTestLoader.loadTestsFromTestCase(ActorTestCase))
     suite.addTests(unittest.defaultTestLoader.loadTestsFromTestCase(CastTestCase))
+    suite.addTests(unittest.defaultTestLoader.loadTestsFromTestCase(AuthTestCase))
+    suite.addTests(
+        unittest.defaultTestLoader.loadTestsFromTestCase(CryptographyAuthTestCase)
+    )
     return suite
 
 
@@ -0,0 +1,59 @@
+from flask import abort, jsonify, request
+
+from models import Actor, Movie, _insert_many
+
+# partial: insert the valid items and report the others, atomic: insert
+# nothing unless every item is valid
+BATCH_MODES = ("partial", "atomic")
+MAX_BATCH_SIZE = 1000
+
+
+def _batch_mode():
+    mode = request.args.get("mode", "partial", type=str)
+    if mode not in BATCH_MODES:
+        raise ValueError("invalid batch mode")
+    return mode
+
+
+def _batch_create(model: type[Movie | Actor], values_for):
+    """
+    Creates a record of `model` for every item of the request's JSON array.
+    `values_for` turns an item into column values and raises ValueError for
+    an invalid one. The response lists the new ids by position (null for an
+    item that wasn't created) and an error per invalid item. It's a 201 if
+    anything was created, otherwise a 422.
+    """
+    body = request.get_json()
+    if not isinstance(body, list) or not body or len(body) > MAX_BATCH_SIZE:
+        abort(400)
+    try:
+        mode = _batch_mode()
+    except ValueError:
+        abort(400)
+
+    rows = []
+    errors = []
+    for index, item in enumerate(body):
+        try:
+            rows.append((index, values_for(item)))
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+
+    ids = [None] * len(body)
+    if rows and not (errors and mode == "atomic"):
+        new_ids = _insert_many(model, [values for _, values in rows])
+        for (index, _), new_id in zip(rows, new_ids):
+            ids[index] = new_id
+
+    payload = {"success": not errors, "ids": ids, "errors": errors}
+    return jsonify(payload), (201 if any(ids) else 422)
+
+
+def _id_set(body, key: str):
+    # The distinct ids listed under body[key]; raises ValueError
+    ids = body.get(key) if isinstance(body, dict) else None
+    if not isinstance(ids, list) or len(ids) > MAX_BATCH_SIZE:
+        raise ValueError(f"{key} must be a list of at most {MAX_BATCH_SIZE} ids")
+    if not all(isinstance(id, int) and not isinstance(id, bool) for id in ids):
+        raise ValueError(f"{key} must be a list of integers")
+    return set(ids)
@@ -0,0 +1,298 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import Actor, Movie, _cache_tag
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - only needed with RESPONSE_CACHE_URL
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# redis://host:6379/0 shares the cache between workers and tasks. Without it,
+# RESPONSE_CACHE_SIZE > 0 keeps that many responses per worker instead.
+RESPONSE_CACHE_URL = os.environ.get("RESPONSE_CACHE_URL", "")
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", 0))
+# Upper bound on staleness for anything invalidation can't see, e.g. raw SQL
+RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", 60))
+# Seconds to go without the backend after it fails
+RESPONSE_CACHE_RETRY = 30
+
+
+class MemoryBackend:
+    """
+    In-process store implementing the part of the redis-py client the cache
+    uses: get, mget, set with ex, incr and pipeline (incr and set). Values are LRU-bounded;
+    counters are never evicted, since losing one could resurrect old entries.
+    Also stands in for Redis in the tests.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._values = OrderedDict()  # name -> (expires, value)
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._values)
+
+    def get(self, name: str):
+        with self._lock:
+            if name in self._counters:
+                return self._counters[name]
+            entry = self._values.get(name)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] < time.monotonic():
+                del self._values[name]
+                return None
+            self._values.move_to_end(name)
+            return entry[1]
+
+    def mget(self, names: list[str]):
+        return [self.get(name) for name in names]
+
+    def set(self, name: str, value: bytes, ex: int | None = None):
+        expires = time.monotonic() + ex if ex is not None else None
+        with self._lock:
+            self._values[name] = (expires, value)
+            self._values.move_to_end(name)
+            while len(self._values) > self.max_entries:
+                self._values.popitem(last=False)
+        return True
+
+    def incr(self, name: str):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + 1
+            return self._counters[name]
+
+    def pipeline(self, transaction: bool = True):
+        return _MemoryPipeline(self)
+
+
+class _MemoryPipeline:
+    def __init__(self, backend: MemoryBackend):
+        self._backend = backend
+        self._calls = []
+
+    def incr(self, name: str):
+        self._calls.append((self._backend.incr, (name,), {}))
+        return self
+
+    def set(self, name: str, value: bytes, ex: int | None = None):
+        self._calls.append((self._backend.set, (name, value), {"ex": ex}))
+        return self
+
+    def execute(self):
+        return [method(*args, **kwargs) for method, args, kwargs in self._calls]
+
+
+class _Unavailable(Exception):
+    pass
+
+
+class ResponseCache:
+    """
+    GET responses (and other pre-encoded values) in a Redis-like backend.
+    Keys embed the current version of each of their tags ("actors",
+    "actors:1"), so invalidating a tag is a single INCR and the orphaned
+    entries simply expire. A failing backend is skipped for
+    RESPONSE_CACHE_RETRY seconds, during which requests go uncached.
+    """
+
+    def __init__(
+        self, backend, ttl: int = RESPONSE_CACHE_TTL, prefix: str = "audition"
+    ):
+        self.backend = backend
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.fragment_hits = 0
+        self.fragment_misses = 0
+        self.errors = 0
+        self._down_until = 0.0
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def _call(self, method: str, *args, **kwargs):
+        if time.monotonic() < self._down_until:
+            raise _Unavailable()
+        try:
+            return getattr(self.backend, method)(*args, **kwargs)
+        except Exception as e:
+            self.errors += 1
+            self._down_until = time.monotonic() + RESPONSE_CACHE_RETRY
+            logger.warning("response cache unavailable: %s", e)
+            raise _Unavailable() from e
+
+    def key(self, parts: tuple, tags: list[str]):
+        """The key for `parts` under the tags' current versions, None if unavailable."""
+        try:
+            versions = self._call("mget", [f"{self.prefix}:tag:{tag}" for tag in tags])
+        except _Unavailable:
+            return None
+        digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+        stamp = ".".join(str(int(version or 0)) for version in versions)
+        return f"{self.prefix}:{digest}:{stamp}"
+
+    def get(self, key: str):
+        try:
+            value = self._call("get", key)
+        except _Unavailable:
+            return None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: bytes):
+        try:
+            self._call("set", key, value, ex=self.ttl)
+        except _Unavailable:
+            pass
+
+    def get_many(self, keys: list[str]):
+        """Fragments for `keys` in one round trip, None for each miss."""
+        if not keys:
+            return []
+        try:
+            values = self._call("mget", keys)
+        except _Unavailable:
+            return [None] * len(keys)
+        hits = sum(value is not None for value in values)
+        self.fragment_hits += hits
+        self.fragment_misses += len(keys) - hits
+        return values
+
+    def set_many(self, values: dict[str, bytes]):
+        self._pipeline(
+            [("set", (key, value), {"ex": self.ttl}) for key, value in values.items()]
+        )
+
+    def invalidate(self, tags):
+        self._pipeline([("incr", (f"{self.prefix}:tag:{tag}",), {}) for tag in tags])
+
+    def _pipeline(self, calls: list[tuple[str, tuple, dict]]):
+        # One round trip for every (method, args, kwargs) in `calls`
+        try:
+            pipeline = self._call("pipeline", transaction=False)
+            for method, args, kwargs in calls:
+                getattr(pipeline, method)(*args, **kwargs)
+            pipeline.execute()
+        except _Unavailable:
+            pass
+        except Exception as e:
+            # Raised by execute(); entries expire after the TTL regardless
+            self.errors += 1
+            logger.warning("response cache write failed: %s", e)
+
+    def stats(self):
+        stats = {
+            "backend": type(self.backend).__name__ if self.enabled else None,
+            "enabled": self.enabled,
+            "errors": self.errors,
+            "fragmentHits": self.fragment_hits,
+            "fragmentMisses": self.fragment_misses,
+            "hits": self.hits,
+            "misses": self.misses,
+            "ttl": self.ttl,
+        }
+        if isinstance(self.backend, MemoryBackend):
+            stats["entries"] = len(self.backend)
+            stats["maxEntries"] = self.backend.max_entries
+        return stats
+
+
+def _cache_backend(url: str = RESPONSE_CACHE_URL, size: int = RESPONSE_CACHE_SIZE):
+    if url:
+        if redis is None:
+            logger.warning("RESPONSE_CACHE_URL is set but redis isn't installed")
+            return None
+        # Short timeouts: a slow cache must not be slower than the database
+        return redis.Redis.from_url(url, socket_timeout=0.1, socket_connect_timeout=0.1)
+    if size > 0:
+        return MemoryBackend(size)
+    return None
+
+
+def _encode_response(response):
+    head = json.dumps([response.status_code, list(response.headers.items())])
+    return head.encode() + b"\n" + response.get_data()
+
+
+def _decode_response(value: bytes):
+    head, body = value.split(b"\n", 1)
+    status, headers = json.loads(head)
+    return current_app.response_class(body, status, headers)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session):
+    # Tags are collected by models._touch_table during the transaction
+    tags = session.info.pop("invalidated_tags", None)
+    if tags and has_app_context():
+        cache = current_app.extensions.get("response_cache")
+        if cache is not None and cache.enabled:
+            cache.invalidate(tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session):
+    session.info.pop("invalidated_tags", None)
+
+
+def _cached_response(model: type[Movie | Actor]):
+    """
+    Serves the GET handler from the app's response cache when it's enabled.
+    Keyed by path, query parameters and the permission the route requires;
+    tagged with the record for detail routes and with the table otherwise.
+    Sits below requires_auth, so hits are still authorized.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            cache = current_app.extensions.get("response_cache")
+            if cache is None or not cache.enabled:
+                return f(*args, **kwargs)
+            tags = [_cache_tag(model, record_id) for record_id in kwargs.values()]
+            parts = (
+                request.path,
+                tuple(sorted(request.args.items(multi=True))),
+                g.get("permission", ""),
+            )
+            key = cache.key(parts, tags or [_cache_tag(model)])
+            if key is None:
+                return f(*args, **kwargs)
+            cached = cache.get(key)
+            if cached is not None:
+                response = _decode_response(cached)
+                response.headers["X-Cache"] = "HIT"
+                return response.make_conditional(request)
+
+            # A write committing meanwhile moves the tags on, so this entry is
+            # only ever read if the data it was built from is still current
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                cache.set(key, _encode_response(response))
+            response.headers["X-Cache"] = "MISS"
+            return response
+
+        return wrapper
+
+    return decorator
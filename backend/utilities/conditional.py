@@ -0,0 +1,137 @@
+import hashlib
+import os
+from urllib.parse import urlencode
+
+from flask import Response, abort, jsonify, make_response, request
+from sqlalchemy import select
+
+from models import (
+    Actor,
+    Movie,
+    TableVersion,
+    _delete_if_current,
+    _update_if_changed,
+    db,
+)
+from utilities.utilities import _version_etag
+
+# Sent with list responses. Browsers revalidate every time (max-age=0) but may
+# show the previous page meanwhile; a CDN keying on Authorization can be
+# allowed to share it, e.g. "public, s-maxage=5, stale-while-revalidate=30".
+LIST_CACHE_CONTROL = os.environ.get(
+    "LIST_CACHE_CONTROL", "private, max-age=0, stale-while-revalidate=30"
+)
+
+
+def _not_modified(model: type[Movie | Actor], record_id: int):
+    """
+    Returns a 304 response when If-None-Match matches the record's current
+    ETag, None when the full response is needed. Only the version is read, so
+    a revalidation costs one indexed lookup and no relationship loads.
+    Aborts with 404 for unknown ids.
+    """
+    if not request.if_none_match:
+        return None
+    version = db.session.execute(
+        select(model.version).where(model.id == record_id)
+    ).scalar()
+    if version is None:
+        abort(404)
+    etag = _version_etag(record_id, version)
+    # Weak comparison, as RFC 9110 requires for If-None-Match; also matches "*"
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = make_response("", 304)
+    response.set_etag(etag)
+    return response
+
+
+def _collection_etag(model: type[Movie | Actor]):
+    """
+    ETag for a list response: the table's change counter plus the query
+    parameters. Any change to a record of `model`, including to the related
+    records it embeds, bumps the counter.
+    """
+    version = db.session.execute(
+        select(TableVersion.version).where(TableVersion.name == model.__tablename__)
+    ).scalar()
+    params = urlencode(sorted(request.args.items(multi=True)))
+    digest = hashlib.sha256(params.encode()).hexdigest()[:16]
+    return f"{model.__tablename__}-{version or 0}-{digest}"
+
+
+def _cacheable(response: Response, etag: str):
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = LIST_CACHE_CONTROL
+    # Lists depend on the caller's permissions
+    response.vary.add("Authorization")
+    return response
+
+
+def _collection_not_modified(etag: str):
+    # 304 with the same caching headers when If-None-Match is current, else None
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    return _cacheable(make_response("", 304), etag)
+
+
+def _if_match_versions(record_id: int):
+    """
+    Versions of the record that If-Match accepts: None for "*", otherwise the
+    versions of strong tags naming this record (possibly none).
+    """
+    if request.if_match.star_tag:
+        return None
+    versions = []
+    # Weak tags never match under If-Match's strong comparison
+    for tag in request.if_match.as_set():
+        tag_id, _, version = tag.partition("-")
+        if tag_id == str(record_id) and version.isdigit():
+            versions.append(int(version))
+    return versions
+
+
+def _precondition_version(model: type[Movie | Actor], record_id: int, versions):
+    # After a conditional write matched nothing: 404, 412, or the current version.
+    # If-Match, "*" included, never matches a missing record (RFC 9110 13.1.1)
+    version = db.session.execute(
+        select(model.version).where(model.id == record_id)
+    ).scalar()
+    if version is None:
+        abort(412 if request.if_match else 404)
+    if versions is not None and version not in versions:
+        abort(412)
+    return version
+
+
+def _apply_patch(model: type[Movie | Actor], record_id: int, values: dict):
+    """
+    Applies the patched columns in a single UPDATE that only matches when one
+    of them differs from what is stored, returning the new version; nothing
+    is read first and no relationships are loaded. Under If-Match the UPDATE
+    is also conditional on the version, 412 when it has moved on. 204 when
+    the values are already stored, without writing.
+    """
+    versions = _if_match_versions(record_id) if request.if_match else None
+    version = _update_if_changed(model, record_id, values, versions)
+    if version is None:
+        db.session.rollback()
+        version = _precondition_version(model, record_id, versions)
+        response = make_response(jsonify(), 204)
+    else:
+        db.session.commit()
+        response = make_response(jsonify({"success": True, "id": record_id}), 200)
+    response.set_etag(_version_etag(record_id, version))
+    return response
+
+
+def _apply_delete(model: type[Movie | Actor], record_id: int):
+    # One DELETE ... RETURNING, nothing loaded first; under If-Match conditional
+    # on the version, 412 when it has moved on
+    versions = _if_match_versions(record_id) if request.if_match else None
+    if not _delete_if_current(model, record_id, versions):
+        db.session.rollback()
+        _precondition_version(model, record_id, versions)
+        abort(412)
+    db.session.commit()
+    return make_response(jsonify({"success": True, "id": record_id}), 200)
@@ -0,0 +1,52 @@
+import os
+from datetime import datetime, timezone
+
+from flask import Response, current_app, request, stream_with_context
+from sqlalchemy import select
+from sqlalchemy.orm import InstrumentedAttribute
+
+from models import db
+from utilities.utilities import _public_columns, _snake_to_camel
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 2000))
+
+
+def _since():
+    # ?since= as ISO 8601; naive timestamps are taken as UTC. Raises ValueError.
+    value = request.args.get("since", None, type=str)
+    if value is None:
+        return None
+    since = datetime.fromisoformat(value)
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return since
+
+
+def _ndjson_export(
+    model, changed_at: InstrumentedAttribute, order_by: list[InstrumentedAttribute]
+):
+    """
+    Streams every public column of `model` as one camelCase JSON object per line,
+    optionally limited to rows whose `changed_at` is at or after ?since=.
+    Rows come from a server-side cursor EXPORT_BATCH_SIZE at a time and are
+    encoded per batch, so memory use doesn't depend on the table size.
+    Raises ValueError for a bad ?since=.
+    """
+    since = _since()
+    columns = [getattr(model, name) for name in _public_columns(model)]
+    keys = [_snake_to_camel(column.key) for column in columns]
+    statement = select(*columns).order_by(*order_by)
+    if since is not None:
+        statement = statement.where(changed_at >= since)
+
+    def generate():
+        dumps = current_app.json.dumps
+        # yield_per turns on stream_results, i.e. a named cursor with psycopg2
+        result = db.session.execute(
+            statement.execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        for rows in result.partitions():
+            yield "".join(dumps(dict(zip(keys, row))) + "\n" for row in rows)
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
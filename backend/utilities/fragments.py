@@ -0,0 +1,76 @@
+from flask import current_app
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import selectinload
+
+from models import Actor, Movie, db
+from utilities.serializers import _serializer
+from utilities.sql_json import _json_object
+from utilities.utilities import _snake_to_camel
+
+
+def _fragments_enabled(columns: tuple[str, ...] | None):
+    # Only full records are cached: a sparse fieldset doesn't load the version
+    cache = current_app.extensions.get("response_cache")
+    return columns is None and cache is not None and cache.enabled
+
+
+def _fragment_key(model: type[Movie | Actor], relation: str | None, record):
+    cache = current_app.extensions["response_cache"]
+    shape = relation or ""
+    return f"{cache.prefix}:fragment:{model.__tablename__}:{shape}:{record.id}:{record.version}"
+
+
+def _encoded_records(
+    model: type[Movie | Actor], records: list, relation: str | None = None
+):
+    """
+    The JSON text _serializer(model, None, relation) would produce for each of
+    `records`, taken from the response cache where possible. Fragments are
+    keyed by id and version, and a record's version moves whenever it or the
+    records it embeds change, so they are never invalidated, only expire.
+    `relation` is loaded for the misses alone, so leave it unloaded.
+    """
+    cache = current_app.extensions["response_cache"]
+    keys = [_fragment_key(model, relation, record) for record in records]
+    encoded = [
+        None if value is None else value.decode() for value in cache.get_many(keys)
+    ]
+    missing = [i for i, text in enumerate(encoded) if text is None]
+    if not missing:
+        return encoded
+
+    dumps = current_app.json.dumps
+    serialize = _serializer(model)
+    if relation is None:
+        for i in missing:
+            encoded[i] = dumps(serialize(records[i]))
+    else:
+        _load_relation(model, relation, [records[i] for i in missing])
+        # Related records shared by several misses are looked up once
+        children = {
+            child.id: child for i in missing for child in getattr(records[i], relation)
+        }
+        related_model = model.__mapper__.relationships[relation].mapper.class_
+        children_encoded = dict(
+            zip(children, _encoded_records(related_model, list(children.values())))
+        )
+        key = _snake_to_camel(relation)
+        for i in missing:
+            items = ",".join(
+                children_encoded[child.id] for child in getattr(records[i], relation)
+            )
+            encoded[i] = _json_object(serialize(records[i]), {key: f"[{items}]"})
+    cache.set_many({keys[i]: encoded[i].encode() for i in missing})
+    return encoded
+
+
+def _load_relation(model: type[Movie | Actor], relation: str, records: list):
+    # One SELECT ... WHERE id IN (...) like selectinload, for the records that
+    # don't have it yet; the identity map hands back the same instances
+    unloaded = [record.id for record in records if relation in inspect(record).unloaded]
+    if unloaded:
+        db.session.scalars(
+            select(model)
+            .where(model.id.in_(unloaded))
+            .options(selectinload(getattr(model, relation)))
+        ).all()
@@ -0,0 +1,60 @@
+import enum
+import os
+import typing as t
+from datetime import date
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+# "orjson" or "stdlib". orjson is used whenever it is installed unless overridden.
+JSON_PROVIDER = os.environ.get("JSON_PROVIDER", "orjson")
+
+
+def _default(o: t.Any):
+    # Dates and enums are passed to the encoder as-is instead of being
+    # formatted by hand, so both providers need to agree on their encoding
+    if isinstance(o, enum.Enum):
+        return o.value
+    if isinstance(o, date):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's provider, but with dates as ISO 8601 and enums as their value."""
+
+    default = staticmethod(_default)  # type: ignore[assignment]
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    Encodes directly to bytes with orjson. Keys are sorted and the output is
+    compact with a trailing newline, like Flask's provider outside debug mode.
+    """
+
+    option = orjson.OPT_SORT_KEYS if orjson else 0
+
+    def dumps(self, obj: t.Any, **kwargs: t.Any) -> str:
+        return orjson.dumps(obj, default=_default, option=self.option).decode()
+
+    def loads(self, s: str | bytes, **kwargs: t.Any) -> t.Any:
+        # orjson.JSONDecodeError subclasses ValueError, so bad bodies still 400
+        return orjson.loads(s)
+
+    def response(self, *args: t.Any, **kwargs: t.Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(
+            obj, default=_default, option=self.option | orjson.OPT_APPEND_NEWLINE
+        )
+        return self._app.response_class(body, mimetype="application/json")
+
+
+def _json_provider(app: Flask, name: str = JSON_PROVIDER):
+    if name == "orjson" and orjson is not None:
+        return OrjsonProvider(app)
+    return StdlibJSONProvider(app)
@@ -0,0 +1,142 @@
+import base64
+import json
+import os
+
+from flask import request
+from flask_sqlalchemy.query import Query
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.orm import InstrumentedAttribute
+
+from models import db
+
+MAX_PAGE_SIZE = 100
+
+# exact: COUNT(*), estimated: planner statistics, none: hasMore instead of a total
+COUNT_MODES = ("exact", "estimated", "none")
+DEFAULT_COUNT_MODE = os.environ.get("LIST_COUNT_MODE", "exact")
+
+
+def _page_size(default: int):
+    # ?limit=, capped at MAX_PAGE_SIZE
+    limit = request.args.get("limit", default, type=int)
+    if limit < 1:
+        return default
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def _count_mode():
+    mode = request.args.get("count", DEFAULT_COUNT_MODE, type=str)
+    if mode not in COUNT_MODES:
+        raise ValueError("invalid count mode")
+    return mode
+
+
+def _estimated_count(query: Query):
+    entity = next(
+        column["entity"]
+        for column in query.column_descriptions
+        if column["entity"] is not None
+    )
+    table = entity.__table__.name
+    if query.whereclause is None:
+        # Unfiltered: the estimate kept by VACUUM/ANALYZE
+        reltuples = db.session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:t)"),
+            {"t": table},
+        ).scalar()
+        if reltuples is not None and reltuples >= 0:
+            return reltuples
+        # -1 until the table is first analyzed
+        return query.order_by(None).count()
+    # Filtered: the planner's row estimate
+    compiled = query.order_by(None).statement.compile(dialect=db.engine.dialect)
+    plan = (
+        db.session.connection()
+        .exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params)
+        .scalar()
+    )
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _total(query: Query, count_mode: str):
+    if count_mode == "exact":
+        return query.order_by(None).count()
+    if count_mode == "estimated":
+        return _estimated_count(query)
+    return None
+
+
+def _offset_page(query: Query, start: int, size: int, count_mode: str):
+    """
+    Returns (rows, total, has_more); in exact mode the total comes back with
+    the page. total is None in "none" mode.
+    """
+    if count_mode == "exact":
+        # A scalar subquery, not count(*) OVER (), which would sort every row
+        total_column = (
+            select(func.count())
+            .select_from(query.order_by(None).subquery())
+            .scalar_subquery()
+        )
+        results = query.add_columns(total_column).slice(start, start + size).all()
+        if not results:
+            # Past the last page no row carries the total
+            return [], _total(query, count_mode), False
+        total = results[0][-1]
+        return [row[0] for row in results], total, start + len(results) < total
+    rows = query.slice(start, start + size + 1).all()
+    return rows[:size], _total(query, count_mode), len(rows) > size
+
+
+def _encode_cursor(values: list):
+    # Opaque to clients
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, length: int):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("invalid cursor")
+    if not isinstance(values, list) or len(values) != length:
+        raise ValueError("invalid cursor")
+    return values
+
+
+def _cursor_value_valid(value, column: InstrumentedAttribute):
+    # Exact type (bool is an int); ints must fit INTEGER and strings can't hold NUL
+    python_type = column.type.python_type
+    if type(value) is not python_type:
+        return False
+    if python_type is int:
+        return -(2**31) <= value < 2**31
+    if python_type is str:
+        return "\x00" not in value
+    return True
+
+
+def _keyset_page(
+    query: Query, columns: list[InstrumentedAttribute], cursor: str, size: int
+):
+    """
+    Returns (rows, next_cursor) for the page after `cursor` (empty for the
+    first), ordered by `columns`, the last of them unique. The next cursor is
+    read from the rows, so `columns` must be loaded.
+    """
+    if cursor:
+        values = _decode_cursor(cursor, len(columns))
+        for value, column in zip(values, columns):
+            if not _cursor_value_valid(value, column):
+                raise ValueError("invalid cursor")
+        # A row-value comparison, so the composite index can seek to it
+        query = query.filter(tuple_(*columns) > tuple_(*values))
+    rows = query.order_by(*columns).limit(size + 1).all()
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    last = rows[-1]
+    return rows, _encode_cursor([getattr(last, column.key) for column in columns])
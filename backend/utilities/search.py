@@ -0,0 +1,106 @@
+from flask_sqlalchemy.query import Query
+from sqlalchemy import func, literal, select, text
+from sqlalchemy.orm import InstrumentedAttribute
+
+from models import db
+
+# Keyed by database URL, so the probe below runs once per database per worker.
+_trigram_support: dict[str, bool] = {}
+
+
+def _trigram_search_available() -> bool:
+    # The pg_trgm extension, the f_unaccent() wrapper and the GIN expression
+    # indexes are installed by a migration. Databases built with db.create_all()
+    # (e.g. the test database) do not have them, so fall back to ILIKE there.
+    key = str(db.engine.url)
+    if key not in _trigram_support:
+        _trigram_support[key] = bool(
+            db.session.execute(
+                text(
+                    "SELECT to_regprocedure('f_unaccent(text)') IS NOT NULL "
+                    "AND to_regprocedure('similarity(text, text)') IS NOT NULL"
+                )
+            ).scalar()
+        )
+    return _trigram_support[key]
+
+
+def _normalize(expression):
+    # Must match the indexed expression exactly: lower(f_unaccent(column))
+    return func.lower(func.f_unaccent(expression))
+
+
+def _apply_search_filter(query: Query, column: InstrumentedAttribute, search: str):
+    if not search:
+        return query
+    if _trigram_search_available():
+        # f_unaccent is IMMUTABLE, so the right-hand side is folded to a
+        # constant at plan time and the trigram index can serve the LIKE.
+        term = _normalize(literal(_escape_like(search)))
+        pattern = func.concat("%", term, "%")
+        return query.filter(_normalize(column).like(pattern, escape="\\"))
+    return query.filter(column.ilike(f"%{_escape_like(search)}%", escape="\\"))
+
+
+def _order_by_search_rank(
+    query: Query,
+    column: InstrumentedAttribute,
+    search: str,
+    tiebreaker: InstrumentedAttribute,
+):
+    if search and _trigram_search_available():
+        rank = func.similarity(_normalize(column), _normalize(literal(search)))
+        return query.order_by(rank.desc(), column, tiebreaker)
+    return query.order_by(column, tiebreaker)
+
+
+def _escape_like(value: str):
+    # The search term as a LIKE pattern matching only itself, with escape="\\"
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _suggest(
+    label: InstrumentedAttribute,
+    popularity: InstrumentedAttribute,
+    search: str,
+    limit: int,
+):
+    """
+    (id, label) rows for typeahead, read without hydrating ORM objects.
+    Prefix matches rank first, then substring matches, each ordered by how many
+    casts the record has. `popularity` is the casts column referencing the id.
+    """
+    model = label.class_
+    cast_count = (
+        select(func.count())
+        .select_from(popularity.class_)
+        .where(popularity == model.id)
+        .scalar_subquery()
+    )
+    if _trigram_search_available():
+        # Both phases are served by the trigram GIN index
+        normalized, term = _normalize(label), _normalize(literal(search))
+        pattern = _normalize(literal(_escape_like(search)))
+        prefix = normalized.like(func.concat(pattern, "%"), escape="\\")
+        infix = normalized.like(func.concat("%", pattern, "%"), escape="\\")
+        infix_rank = [func.similarity(normalized, term).desc()]
+    else:
+        # The prefix phase is served by the lower(...) text_pattern_ops index
+        prefix = func.lower(label).like(_escape_like(search.lower()) + "%", escape="\\")
+        infix = label.ilike(f"%{_escape_like(search)}%", escape="\\")
+        infix_rank = []
+
+    def phase(criterion, ranks, size):
+        statement = (
+            select(model.id, label)
+            .where(criterion)
+            .order_by(*ranks, cast_count.desc(), label, model.id)
+            .limit(size)
+        )
+        return db.session.execute(statement).all()
+
+    rows = phase(prefix, [], limit)
+    if len(rows) < limit:
+        # Only scan for substring matches when prefixes can't fill the list
+        rows += phase(infix & ~prefix, infix_rank, limit - len(rows))
+    return rows
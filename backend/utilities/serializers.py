@@ -0,0 +1,47 @@
+from functools import lru_cache
+
+from models import Actor, Movie
+from utilities.utilities import _public_columns, _snake_to_camel
+
+
+def _compile_fields(model: type[Movie | Actor], columns: tuple[str, ...] | None):
+    # (camelCase key, attribute, converter) per column, so no key is rewritten per row.
+    # Dates and enums need no converter: the app's JSON provider encodes them.
+    if columns is None:
+        columns = _public_columns(model)
+    return [(_snake_to_camel(name), name, None) for name in columns]
+
+
+def _serialize_fields(record, fields):
+    item = {}
+    for key, attribute, convert in fields:
+        value = getattr(record, attribute)
+        item[key] = value if convert is None or value is None else convert(value)
+    return item
+
+
+@lru_cache(maxsize=None)
+def _serializer(
+    model: type[Movie | Actor],
+    columns: tuple[str, ...] | None = None,
+    relation: str | None = None,
+):
+    """
+    Returns a function turning a `model` instance into its camelCase response
+    dict: the given columns (all when None) plus, when `relation` is set, the
+    related records in their collection shape. Built once per shape.
+    """
+    fields = _compile_fields(model, columns)
+    if relation is not None:
+        related_model = model.__mapper__.relationships[relation].mapper.class_
+        nested = _serializer(related_model)
+        fields.append(
+            (
+                _snake_to_camel(relation),
+                relation,
+                lambda records: [nested(record) for record in records],
+            )
+        )
+    # Same key order as format(), so the output matches even without sort_keys
+    fields = tuple(sorted(fields, key=lambda field: field[0]))
+    return lambda record: _serialize_fields(record, fields)
@@ -0,0 +1,85 @@
+import os
+from functools import lru_cache
+
+from flask import current_app, request
+from sqlalchemy import Text, cast, func, literal, select, text
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from models import Actor, Movie
+from utilities.utilities import _public_columns, _snake_to_camel
+
+# orm: serialize models in Python, db: PostgreSQL renders each record's JSON
+RENDER_MODES = ("orm", "db")
+DEFAULT_RENDER_MODE = os.environ.get("LIST_RENDER_MODE", "orm")
+
+
+def _render_mode():
+    mode = request.args.get("render", DEFAULT_RENDER_MODE, type=str)
+    if mode not in RENDER_MODES:
+        raise ValueError("invalid render mode")
+    return mode
+
+
+def _json_build_object(model: type[Movie | Actor], columns: tuple[str, ...] | None):
+    if columns is None:
+        columns = _public_columns(model)
+    return {_snake_to_camel(name): getattr(model, name) for name in columns}
+
+
+@lru_cache(maxsize=None)
+def _json_record(
+    model: type[Movie | Actor],
+    columns: tuple[str, ...] | None = None,
+    relation: str | None = None,
+):
+    """
+    SQL expression rendering a `model` row as _serializer would, as text so the
+    driver doesn't parse it.
+    """
+    fields = _json_build_object(model, columns)
+    if relation is not None:
+        prop = model.__mapper__.relationships[relation]
+        related_model = prop.mapper.class_
+        nested = func.json_build_object(
+            *_flatten(_json_build_object(related_model, None))
+        )
+        fields[_snake_to_camel(relation)] = (
+            select(
+                func.coalesce(
+                    func.json_agg(aggregate_order_by(nested, *prop.order_by)),
+                    text("'[]'::json"),
+                )
+            )
+            .select_from(related_model)
+            .join(prop.secondary, prop.secondaryjoin)
+            .where(prop.primaryjoin)
+            .scalar_subquery()
+        )
+    return cast(func.json_build_object(*_flatten(fields)), Text)
+
+
+def _flatten(fields: dict):
+    # json_build_object('key', value, ...) keeps argument order
+    arguments = []
+    for key in sorted(fields):
+        arguments += [literal(key), fields[key]]
+    return arguments
+
+
+def _json_array(rows):
+    # Rows are the JSON text or (json, ...)
+    return "[" + ",".join(row if isinstance(row, str) else row[0] for row in rows) + "]"
+
+
+def _json_object(payload: dict, encoded: dict[str, str]):
+    # `payload` serialized with sorted keys, plus the already encoded `encoded`
+    dumps = current_app.json.dumps
+    values = {key: dumps(value) for key, value in payload.items()}
+    values.update(encoded)
+    members = ",".join(f"{dumps(key)}:{values[key]}" for key in sorted(values))
+    return "{" + members + "}"
+
+
+def _json_body(payload: dict, encoded: dict[str, str]):
+    # _json_object as a response body
+    return _json_object(payload, encoded) + "\n"
@@ -1,8 +1,8 @@
-import hashlib
-import json
 import re
 
-from models import Actor, Movie
+from flask import request
+
+from models import Actor, Cast, Movie
 
 
 def _camel_to_snake(camel_case_str: str):
@@ -19,6 +19,8 @@ def _snake_to_camel(snake_case_str: str):
 
 
 def _camel_case_dict(item: dict):
+    # No longer used for responses; kept only as the reference that
+    # utilities.serializers is tested and benchmarked against, with format()
     new_item = {}
     for key in item:
         if (
@@ -37,6 +39,10 @@ def _camel_case_dict(item: dict):
     return new_item
 
 
+class InternalColumnPatch(Exception):
+    pass
+
+
 def _convert_json_patch_request_to_dict(body: list[dict], model: type[Movie | Actor]):
     new_dict = {}
     for item in body:
@@ -50,6 +56,8 @@ def _convert_json_patch_request_to_dict(body: list[dict], model: type[Movie | Ac
             raise ValueError("invalid JSON patch operation")
         if item["path"] is None or _camel_to_snake(item["path"][1:]) not in [column.name for column in model.__table__.columns]:  # type: ignore
             raise ValueError("invalid JSON patch path")
+        if _camel_to_snake(item["path"][1:]) not in _public_columns(model):
+            raise InternalColumnPatch("column is not writable through the API")
         new_dict[_camel_to_snake(item["path"][1:])] = (
             item["value"] if item["op"] != "remove" else None
         )
@@ -57,13 +65,44 @@ def _convert_json_patch_request_to_dict(body: list[dict], model: type[Movie | Ac
     return new_dict
 
 
+def _public_columns(model: type[Movie | Actor | Cast]):
+    # Column names exposed through the API, i.e. not marked info={"internal": True}
+    return tuple(
+        column.name
+        for column in model.__table__.columns  # type: ignore
+        if not column.info.get("internal")
+    )
+
+
+def _sparse_fieldset(model: type[Movie | Actor], relation: str):
+    # ?fields=id,name picks columns (id is always returned) and ?include= picks
+    # relations, empty for none. Returns (columns or None for all, include relation?)
+    columns = None
+    fields = request.args.get("fields", None, type=str)
+    if fields is not None:
+        names = {_camel_to_snake(name.strip()) for name in fields.split(",")} - {""}
+        if not names <= set(_public_columns(model)):
+            raise ValueError("invalid fields")
+        columns = ("id", *sorted(names - {"id"}))
+
+    include = True
+    includes = request.args.get("include", None, type=str)
+    if includes is not None:
+        names = {name.strip() for name in includes.split(",")} - {""}
+        if not names <= {relation}:
+            raise ValueError("invalid include")
+        include = relation in names
+    return columns, include
+
+
 def _create_etag(record: Movie | Actor):
-    # Convert the dictionary to a JSON string
-    orig_dict_string = json.dumps(
-        record.format(), sort_keys=True
-    )  # sort_keys to ensure consistent ordering
-    # Create a SHA-256 hash of the string to use for comparison and as an ETag
-    return hashlib.sha256(orig_dict_string.encode()).hexdigest()
+    # The version changes whenever the record or its related records do,
+    # so there's nothing to serialize or hash
+    return _version_etag(record.id, record.version)
+
+
+def _version_etag(record_id: int, version: int):
+    return f"{record_id}-{version}"
 
 
 def _abort_if_falsy_and_not_none(value):
@@ -12,7 +12,6 @@ import {
   useState,
   type SyntheticEvent,
 } from "react";
-import type { Actor } from "../../models/actor";
 import { BaseUrlContext } from "../../shared/base-url";
 import { useDataLoader } from "../../shared/data-loader";
 
@@ -33,21 +32,17 @@ export function ActorAutosearch({
   >([]);
   const [search, setSearch] = useState("");
   const { data, isLoading } = useDataLoader<{
-    actors: Actor[];
-    totalActors: number;
+    suggestions: { id: number; label: string }[];
     success: boolean;
-    offset: number;
-  }>(`${baseUrl}/actors?page=1&search=${search}`, {
-    actors: [],
-    totalActors: 0,
+  }>(`${baseUrl}/actors/suggest?search=${search}`, {
+    suggestions: [],
     success: true,
-    offset: 0,
   });
 
   function filterOptions() {
-    return data.actors.map((actor: Actor) => ({
-      id: actor.id,
-      label: `${actor.name} | id: ${actor.id}`,
+    return data.suggestions.map((suggestion) => ({
+      id: suggestion.id,
+      label: `${suggestion.label} | id: ${suggestion.id}`,
     }));
   }
 
@@ -72,9 +67,9 @@ export function ActorAutosearch({
     if (search) {
       setOpen(true);
       setOptions(
-        data.actors.map((actor: Actor) => ({
-          id: actor.id,
-          label: `${actor.name}  | id: ${actor.id}`,
+        data.suggestions.map((suggestion) => ({
+          id: suggestion.id,
+          label: `${suggestion.label} | id: ${suggestion.id}`,
         })),
       );
     }
@@ -12,7 +12,6 @@ import {
   useState,
   type SyntheticEvent,
 } from "react";
-import type { Movie } from "../../models/movie";
 import { BaseUrlContext } from "../../shared/base-url";
 import { useDataLoader } from "../../shared/data-loader";
 
@@ -33,21 +32,17 @@ export function MovieAutosearch({
   >([{ label: "Not Selected", id: 0 }]);
   const [search, setSearch] = useState("");
   const { data, isLoading } = useDataLoader<{
-    movies: Movie[];
-    totalMovies: number;
+    suggestions: { id: number; label: string }[];
     success: boolean;
-    offset: number;
-  }>(`${baseUrl}/movies?page=1&search=${search}`, {
-    movies: [],
-    totalMovies: 0,
+  }>(`${baseUrl}/movies/suggest?search=${search}`, {
+    suggestions: [],
     success: true,
-    offset: 0,
   });
 
   function filterOptions() {
-    return data.movies.map((movie: Movie) => ({
-      id: movie.id,
-      label: `${movie.title} | id: ${movie.id}`,
+    return data.suggestions.map((suggestion) => ({
+      id: suggestion.id,
+      label: `${suggestion.label} | id: ${suggestion.id}`,
     }));
   }
 
@@ -72,9 +67,9 @@ export function MovieAutosearch({
     if (search) {
       setOpen(true);
       setOptions(
-        data.movies.map((movie: Movie) => ({
-          id: movie.id,
-          label: `${movie.title} | id: ${movie.id}`,
+        data.suggestions.map((suggestion) => ({
+          id: suggestion.id,
+          label: `${suggestion.label} | id: ${suggestion.id}`,
         })),
       );
     }